@@ -1,3 +1,84 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from neotype.ratelimit import client_ip, parse_rate
+
+from .models import User
+
+
+class ClientIpTests(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 2.2.2.2')
+
+    def test_forwarded_header_is_ignored_without_proxies(self):
+        self.assertEqual(client_ip(self.request), '10.0.0.1')
+
+    def test_address_is_read_past_the_trusted_hops(self):
+        for hops, address in [(1, '2.2.2.2'), (2, '6.6.6.6'), (3, '10.0.0.1')]:
+            with self.subTest(hops=hops), override_settings(RATELIMIT_PROXY_COUNT=hops):
+                self.assertEqual(client_ip(self.request), address)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('5/15m'), (5, 900))
+        self.assertEqual(parse_rate('3/h'), (3, 3600))
+        with self.assertRaises(ValueError):
+            parse_rate('often')
+
+
+class AuthRateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('typist', 'typist@example.com', 'Passw0rdX')
+
+    def login(self, password, **extra):
+        data = json.dumps({'username': 'typist', 'password': password})
+        return self.client.post('/accounts/login/', data, content_type='application/json', **extra).status_code
+
+    def test_successful_logins_are_not_counted(self):
+        self.assertEqual([self.login('Passw0rdX') for _ in range(8)], [200] * 8)
+
+    def test_failed_logins_are_limited_per_address(self):
+        self.assertEqual([self.login('wrong') for _ in range(6)], [401] * 5 + [429])
+        self.assertEqual(self.login('Passw0rdX'), 429)
+        self.assertEqual(self.login('wrong', REMOTE_ADDR='10.9.9.9'), 401)
+
+    def test_success_clears_the_failures(self):
+        for _ in range(4):
+            self.login('wrong')
+        self.assertEqual(self.login('Passw0rdX'), 200)
+        self.assertEqual([self.login('wrong') for _ in range(5)], [401] * 5)
+
+    @override_settings(RATELIMIT_PROXY_COUNT=1)
+    def test_clients_behind_a_proxy_are_told_apart(self):
+        for _ in range(5):
+            self.login('wrong', HTTP_X_FORWARDED_FOR='9.9.9.9, 4.4.4.4')
+        self.assertEqual(self.login('wrong', HTTP_X_FORWARDED_FOR='8.8.8.8, 4.4.4.4'), 429)
+        self.assertEqual(self.login('wrong', HTTP_X_FORWARDED_FOR='4.4.4.5'), 401)
+
+
+@override_settings(RATELIMIT_RULES=[{'path': '/leaderboard/api/', 'rate': '3/m'}])
+class ApiRateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def statuses(self, count, **extra):
+        return [self.client.get('/leaderboard/api/', **extra).status_code for _ in range(count)]
+
+    def test_blocked_requests_get_429_with_retry_after(self):
+        self.assertEqual(self.statuses(4), [200] * 3 + [429])
+        self.assertIn('Retry-After', self.client.get('/leaderboard/api/'))
+
+    def test_session_cookies_do_not_reset_the_limit(self):
+        statuses = []
+        for n in range(4):
+            self.client.cookies['sessionid'] = f'forged{n}'
+            statuses += self.statuses(1)
+        self.assertEqual(statuses, [200] * 3 + [429])
+
+    def test_signed_in_users_are_limited_per_account(self):
+        self.client.force_login(User.objects.create_user('first', 'first@example.com', 'Passw0rdX'))
+        self.assertEqual(self.statuses(4), [200] * 3 + [429])
+        self.client.force_login(User.objects.create_user('second', 'second@example.com', 'Passw0rdX'))
+        self.assertEqual(self.statuses(1), [200])
@@ -6,9 +6,9 @@ from django.contrib import messages
 from django.http import JsonResponse
 import json
 from django.views.decorators.http import require_http_methods
-from django.core.cache import cache
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
+from neotype.ratelimit import record_attempt
 from .models import User
 from typing_test.models import UserStats
 
@@ -40,11 +40,8 @@ def signup_view(request):
             messages.error(request, error)
         return render(request, 'accounts/signup.html')
     
-    # Rate limiting check
-    cache_key = f'signup_attempts_{request.META.get("REMOTE_ADDR")}'
-    attempts = cache.get(cache_key, 0)
-    
-    if attempts >= 3:  # Max 3 signup attempts per IP per hour
+    # Rate limiting check (failed attempts counted by record_attempt)
+    if request.ratelimited:
         messages.error(request, 'Too many signup attempts. Please try again later.')
         return render(request, 'accounts/signup.html')
     
@@ -61,17 +58,13 @@ def signup_view(request):
         
         # Auto-login after signup
         login(request, user)
-        
-        # Reset signup attempts
-        cache.delete(cache_key)
+        record_attempt(request, succeeded=True)
         
         messages.success(request, f'Welcome to NeoType, {username}!')
         return redirect('/')
         
     except Exception as e:
-        # Increment failed attempts
-        cache.set(cache_key, attempts + 1, 60 * 60)  # 1 hour
-        
+        record_attempt(request, succeeded=False)
         if 'username' in str(e).lower():
             messages.error(request, 'Username already exists')
         elif 'email' in str(e).lower():
@@ -97,11 +90,8 @@ def handle_ajax_signup(request):
         if errors:
             return JsonResponse({'success': False, 'errors': errors}, status=400)
         
-        # Rate limiting check
-        cache_key = f'signup_attempts_{request.META.get("REMOTE_ADDR")}'
-        attempts = cache.get(cache_key, 0)
-        
-        if attempts >= 3:
+        # Rate limiting check (failed attempts counted by record_attempt)
+        if request.ratelimited:
             return JsonResponse({
                 'success': False,
                 'error': 'Too many signup attempts. Please try again later.'
@@ -120,9 +110,7 @@ def handle_ajax_signup(request):
             
             # Auto-login after signup
             login(request, user)
-            
-            # Reset signup attempts
-            cache.delete(cache_key)
+            record_attempt(request, succeeded=True)
             
             return JsonResponse({
                 'success': True,
@@ -135,9 +123,7 @@ def handle_ajax_signup(request):
             })
             
         except Exception as e:
-            # Increment failed attempts
-            cache.set(cache_key, attempts + 1, 60 * 60)  # 1 hour
-            
+            record_attempt(request, succeeded=False)
             error_msg = 'Registration failed'
             if 'username' in str(e).lower():
                 error_msg = 'Username already exists'
@@ -170,11 +156,8 @@ def login_view(request):
     username = request.POST.get('username', '').strip()
     password = request.POST.get('password', '')
     
-    # Rate limiting check
-    cache_key = f'login_attempts_{request.META.get("REMOTE_ADDR")}'
-    attempts = cache.get(cache_key, 0)
-    
-    if attempts >= 5:
+    # Rate limiting check (failed attempts counted by record_attempt)
+    if request.ratelimited:
         messages.error(request, 'Too many login attempts. Try again later.')
         return render(request, 'accounts/login.html')
     
@@ -182,18 +165,14 @@ def login_view(request):
     user = authenticate(request, username=username, password=password)
     
     if user and user.is_active:
-        # Reset login attempts
-        cache.delete(cache_key)
-        
         # Login user
         login(request, user)
+        record_attempt(request, succeeded=True)
         
         messages.success(request, f'Welcome back, {user.username}!')
         return redirect(request.GET.get('next', '/'))
     else:
-        # Increment failed attempts
-        cache.set(cache_key, attempts + 1, 60 * 15)  # 15 minutes
-        
+        record_attempt(request, succeeded=False)
         messages.error(request, 'Invalid username or password')
         return render(request, 'accounts/login.html')
 
@@ -205,11 +184,8 @@ def handle_ajax_login(request):
         username = data.get('username', '').strip()
         password = data.get('password', '')
         
-        # Rate limiting check
-        cache_key = f'login_attempts_{request.META.get("REMOTE_ADDR")}'
-        attempts = cache.get(cache_key, 0)
-        
-        if attempts >= 5:
+        # Rate limiting check (failed attempts counted by record_attempt)
+        if request.ratelimited:
             return JsonResponse({
                 'success': False,
                 'error': 'Too many login attempts. Try again later.'
@@ -219,11 +195,9 @@ def handle_ajax_login(request):
         user = authenticate(request, username=username, password=password)
         
         if user and user.is_active:
-            # Reset login attempts
-            cache.delete(cache_key)
-            
             # Login user
             login(request, user)
+            record_attempt(request, succeeded=True)
             
             return JsonResponse({
                 'success': True,
@@ -235,9 +209,7 @@ def handle_ajax_login(request):
                 }
             })
         else:
-            # Increment failed attempts
-            cache.set(cache_key, attempts + 1, 60 * 15)  # 15 minutes
-            
+            record_attempt(request, succeeded=False)
             return JsonResponse({
                 'success': False,
                 'error': 'Invalid username or password'
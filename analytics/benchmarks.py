@@ -0,0 +1,231 @@
+"""
+Endpoint latency benchmarks with query and allocation budgets.
+
+``seed_database`` fills the (test) database with users, sessions, stats and
+leaderboards; ``run_benchmarks`` drives each endpoint in ``ENDPOINTS``
+through the Django test client as a logged-in user and returns, per
+endpoint, latency percentiles, the most queries any request made and the
+median bytes allocated per request. ``check_budgets`` compares results with
+a baseline of ceilings (``benchmark_baseline.json`` next to this module)
+and lists every regression. ``manage.py benchmark_endpoints`` ties these
+together.
+"""
+import io
+import json
+import random
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import timedelta
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import User
+from leaderboard.board_cache import bump_board_version
+from typing_test.generator import generate_text, make_prompt_ref
+from typing_test.models import TestSession
+
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+
+# Budgets are written with this much headroom over the measured values
+LATENCY_HEADROOM = 1.5
+ALLOCATION_HEADROOM = 1.5
+# ...and at least this much, so sub-millisecond endpoints do not fail on timer noise
+MIN_LATENCY_SLACK_MS = 2.0
+
+# Share of sessions per test duration
+DURATION_MIX = {15: 0.25, 30: 0.5, 60: 0.25}
+
+Endpoint = namedtuple('Endpoint', ['name', 'request', 'prepare'])
+
+
+def seed_database(users=500, sessions=20000, seed=0):
+    """Create users with completed sessions, stats and leaderboards; returns the busiest user"""
+    rng = random.Random(seed)
+    now = timezone.now()
+    password = make_password(None)
+
+    User.objects.bulk_create(
+        [User(username=f'bench{n}', email=f'bench{n}@example.com', password=password) for n in range(users)],
+        batch_size=1000,
+    )
+    user_ids = list(User.objects.filter(username__startswith='bench').values_list('id', flat=True))
+    skill = {user_id: rng.lognormvariate(4.0, 0.3) for user_id in user_ids}
+    # A few users take most of the tests
+    weights = [rng.paretovariate(1.2) for _ in user_ids]
+
+    refs = [make_prompt_ref('medium', 60, seed=n) for n in range(200)]
+    durations, shares = zip(*DURATION_MIX.items())
+    batch = []
+    for user_id in rng.choices(user_ids, weights, k=sessions):
+        duration = rng.choices(durations, shares)[0]
+        ref = rng.choice(refs)
+        wpm = max(5.0, rng.gauss(skill[user_id], 8))
+        accuracy = min(100.0, rng.gauss(95, 3))
+        completed_at = now - timedelta(seconds=rng.uniform(0, 90 * 24 * 60 * 60))
+        batch.append(TestSession(
+            user_id=user_id,
+            duration=duration,
+            prompt_ref=ref,
+            typed_text=generate_text(ref)[:int(wpm * 5 * duration / 60)],
+            wpm=round(wpm, 2),
+            accuracy=round(accuracy, 2),
+            typing_time=duration,
+            composite_score=TestSession.calculate_composite_score(wpm, accuracy),
+            completed=True,
+            started_at=completed_at - timedelta(seconds=duration),
+            completed_at=completed_at,
+        ))
+        if len(batch) >= 5000:
+            TestSession.objects.bulk_create(batch)
+            batch = []
+    TestSession.objects.bulk_create(batch)
+
+    for command, *args in [('populate_texts',), ('reconcile_user_stats',), ('rerank_leaderboards', '--rebuild')]:
+        call_command(command, *args, stdout=io.StringIO())
+    return User.objects.get(id=max(zip(weights, user_ids))[1])
+
+
+def _start(client, duration=60):
+    response = client.post(
+        '/typing/api/start/',
+        json.dumps({'duration': duration, 'prompt_ref': make_prompt_ref('medium', 120, seed=1)}),
+        content_type='application/json',
+    )
+    return response.json()
+
+
+def _complete(client, state):
+    session = state['session']
+    # About 70 WPM for a minute, with one typo
+    typed = session['text'][:350]
+    typed = typed[:100] + 'x' + typed[101:]
+    return client.post(
+        '/typing/api/complete/',
+        json.dumps({'session_id': session['session_id'], 'typed_text': typed, 'actual_time': 60}),
+        content_type='application/json',
+    )
+
+
+def _prepare_complete(client, state):
+    state['session'] = _start(client)
+
+
+ENDPOINTS = [
+    Endpoint('get_test_text', lambda client, state: client.get('/typing/api/text/?duration=60'), None),
+    Endpoint(
+        'start_test_session',
+        lambda client, state: client.post(
+            '/typing/api/start/',
+            json.dumps({'duration': 30, 'prompt_ref': make_prompt_ref('medium', 60, seed=2)}),
+            content_type='application/json',
+        ),
+        None,
+    ),
+    Endpoint('complete_test_session', _complete, _prepare_complete),
+    Endpoint(
+        'get_leaderboard_api',
+        lambda client, state: client.get('/leaderboard/api/?duration=30&period=all_time'),
+        None,
+    ),
+    # Every request after a board changed (version bumped)
+    Endpoint(
+        'get_leaderboard_api_uncached',
+        lambda client, state: client.get('/leaderboard/api/?duration=30&period=all_time'),
+        lambda client, state: bump_board_version(30, 'all_time'),
+    ),
+    Endpoint('profile_view', lambda client, state: client.get('/accounts/profile/'), None),
+    Endpoint('home_view', lambda client, state: client.get('/'), None),
+]
+
+
+def _percentile(cuts, p):
+    return round(cuts[p - 1], 3)
+
+
+def measure(endpoint, client, iterations=200, warmup=20, allocation_samples=20):
+    """Latency percentiles (ms), most queries in one request and median allocated KB"""
+    state = {}
+
+    def call():
+        if endpoint.prepare:
+            endpoint.prepare(client, state)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = endpoint.request(client, state)
+            elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            raise RuntimeError(f'{endpoint.name} returned {response.status_code}: {response.content[:200]!r}')
+        return elapsed, len(queries)
+
+    for _ in range(warmup):
+        call()
+
+    timings = []
+    max_queries = 0
+    for _ in range(iterations):
+        elapsed, query_count = call()
+        timings.append(elapsed * 1000)
+        max_queries = max(max_queries, query_count)
+
+    # Tracing slows everything down, so allocations are sampled separately
+    allocations = []
+    tracemalloc.start()
+    try:
+        for _ in range(allocation_samples):
+            if endpoint.prepare:
+                endpoint.prepare(client, state)
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            endpoint.request(client, state)
+            allocations.append(tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {
+        'p50_ms': _percentile(cuts, 50),
+        'p95_ms': _percentile(cuts, 95),
+        'p99_ms': _percentile(cuts, 99),
+        'queries': max_queries,
+        'alloc_kb': round(statistics.median(allocations) / 1024, 1),
+    }
+
+
+def run_benchmarks(user, endpoints=ENDPOINTS, **options):
+    """Measure every endpoint as ``user``; returns {name: results}"""
+    client = Client()
+    client.force_login(user)
+    return {endpoint.name: measure(endpoint, client, **options) for endpoint in endpoints}
+
+
+def make_baseline(results):
+    """Budgets for results: latency and allocations with headroom, queries exact"""
+    return {
+        name: {
+            'p95_ms': round(max(result['p95_ms'] * LATENCY_HEADROOM, result['p95_ms'] + MIN_LATENCY_SLACK_MS), 1),
+            'queries': result['queries'],
+            'alloc_kb': round(result['alloc_kb'] * ALLOCATION_HEADROOM, 1),
+        }
+        for name, result in results.items()
+    }
+
+
+def check_budgets(results, baseline):
+    """List every endpoint measurement above its budget"""
+    failures = []
+    for name, result in results.items():
+        if name not in baseline:
+            failures.append(f'{name}: no budget in baseline')
+            continue
+        for metric, budget in baseline[name].items():
+            if result[metric] > budget:
+                failures.append(f'{name}: {metric} {result[metric]} exceeds budget {budget}')
+    return failures
@@ -0,0 +1,70 @@
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from neotype.cache_backends import SQLiteCache
+
+BENCHMARK_TABLE = 'benchmark_cache_table'
+
+
+class Command(BaseCommand):
+    help = 'Compare get/set/incr throughput of LocMemCache, DatabaseCache and SQLiteCache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--operations', type=int, default=5000,
+            help='Operations per benchmark (default: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        operations = options['operations']
+        call_command('createcachetable', BENCHMARK_TABLE, verbosity=0)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            backends = [
+                ('LocMemCache', LocMemCache('benchmark', {'OPTIONS': {'MAX_ENTRIES': operations * 2}})),
+                ('DatabaseCache', DatabaseCache(BENCHMARK_TABLE, {'OPTIONS': {'MAX_ENTRIES': operations * 2}})),
+                ('SQLiteCache', SQLiteCache(os.path.join(tmpdir, 'cache.sqlite3'),
+                                            {'OPTIONS': {'MAX_ENTRIES': operations * 2}})),
+            ]
+            try:
+                self.stdout.write(f'{"backend":<15}{"set/s":>12}{"get/s":>12}{"incr/s":>12}')
+                for name, backend in backends:
+                    self.stdout.write(f'{name:<15}' + ''.join(
+                        f'{rate:>12,.0f}' for rate in self.run(backend, operations)
+                    ))
+            finally:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE {connection.ops.quote_name(BENCHMARK_TABLE)}')
+
+    @staticmethod
+    def run(backend, operations):
+        """Return (set, get, incr) operations per second"""
+        backend.clear()
+        keys = [f'bench:{i}' for i in range(operations)]
+        payload = {'leaderboard': [{'username': 'user', 'wpm': 80.5, 'accuracy': 97.2}] * 10}
+
+        start = time.perf_counter()
+        for key in keys:
+            backend.set(key, payload, 300)
+        set_rate = operations / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for key in keys:
+            backend.get(key)
+        get_rate = operations / (time.perf_counter() - start)
+
+        backend.set('bench:counter', 0, 300)
+        start = time.perf_counter()
+        for _ in range(operations):
+            backend.incr('bench:counter')
+        incr_rate = operations / (time.perf_counter() - start)
+
+        backend.clear()
+        return set_rate, get_rate, incr_rate
@@ -0,0 +1,95 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from analytics.benchmarks import BASELINE_PATH, check_budgets, make_baseline, run_benchmarks, seed_database
+
+
+def isolated_caches(tmpdir):
+    """
+    settings.CACHES with every file-backed alias moved into `tmpdir`. The
+    other aliases are kept as configured (database caches live in the
+    throwaway database), so tiered caches still find their L2 alias.
+    """
+    caches = {}
+    for alias, config in settings.CACHES.items():
+        location = config.get('LOCATION')
+        if location and os.path.isabs(str(location)):
+            config = {**config, 'LOCATION': os.path.join(tmpdir, f'cache-{alias}')}
+        caches[alias] = config
+    return caches
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway database and report p50/p95/p99 latency, queries and allocations per endpoint; '
+        'fails when an endpoint exceeds its budget in the baseline file'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help='Users to seed (default: 500)')
+        parser.add_argument('--sessions', type=int, default=20000, help='Test sessions to seed (default: 20000)')
+        parser.add_argument(
+            '--iterations', type=int, default=200,
+            help='Timed requests per endpoint (default: 200)'
+        )
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests first (default: 20)')
+        parser.add_argument(
+            '--baseline', default=str(BASELINE_PATH),
+            help='JSON budgets per endpoint (default: analytics/benchmark_baseline.json)'
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Write budgets from this run instead of checking against them'
+        )
+        parser.add_argument('--output', help='Also write the results as JSON to this file')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # A fresh database and cache so the run neither reads nor disturbs real data
+            if connection.vendor == 'sqlite':
+                connection.settings_dict['TEST']['NAME'] = os.path.join(tmpdir, 'benchmark.sqlite3')
+            caches = isolated_caches(tmpdir)
+            setup_test_environment(debug=False)
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                with override_settings(CACHES=caches, RATELIMIT_ENABLE=False, SECURE_SSL_REDIRECT=False):
+                    self.stdout.write(f'Seeding {options["users"]} users and {options["sessions"]} sessions...')
+                    user = seed_database(options['users'], options['sessions'])
+                    results = run_benchmarks(user, iterations=options['iterations'], warmup=options['warmup'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+
+        if options['update_baseline']:
+            with open(options['baseline'], 'w') as f:
+                json.dump(make_baseline(results), f, indent=2)
+                f.write('\n')
+            self.stdout.write(self.style.SUCCESS(f'Wrote budgets to {options["baseline"]}'))
+            return
+
+        with open(options['baseline']) as f:
+            failures = check_budgets(results, json.load(f))
+        if failures:
+            raise CommandError('Benchmark budgets exceeded:\n  ' + '\n  '.join(failures))
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget'))
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"endpoint":<30}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}{"alloc KB":>10}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<30}{result["p50_ms"]:>9.2f}{result["p95_ms"]:>9.2f}{result["p99_ms"]:>9.2f}'
+                f'{result["queries"]:>9}{result["alloc_kb"]:>10.1f}'
+            )
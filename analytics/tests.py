@@ -1,3 +1,45 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+
+from .benchmarks import BASELINE_PATH, ENDPOINTS, check_budgets, make_baseline, run_benchmarks, seed_database
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    RATELIMIT_ENABLE=False,
+)
+class EndpointQueryBudgetTests(TransactionTestCase):
+    """Query counts are deterministic, so they are checked on every test run; latency is left to the command"""
+
+    def setUp(self):
+        # Real transactions, as in the command: TestCase would turn every atomic block into extra savepoint queries
+        self.user = seed_database(users=20, sessions=300)
+
+    def test_endpoints_stay_within_query_budgets(self):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+        results = run_benchmarks(self.user, iterations=3, warmup=1, allocation_samples=1)
+
+        self.assertEqual(set(results), {endpoint.name for endpoint in ENDPOINTS})
+        for name, result in results.items():
+            with self.subTest(endpoint=name):
+                self.assertLessEqual(result['queries'], baseline[name]['queries'])
+
+
+class CheckBudgetsTests(SimpleTestCase):
+    def setUp(self):
+        self.results = {'home_view': {'p50_ms': 3.0, 'p95_ms': 4.0, 'p99_ms': 5.0, 'queries': 3, 'alloc_kb': 100.0}}
+
+    def test_results_within_their_own_baseline_pass(self):
+        self.assertEqual(check_budgets(self.results, make_baseline(self.results)), [])
+
+    def test_each_regression_is_reported(self):
+        baseline = {'home_view': {'p95_ms': 3.5, 'queries': 2, 'alloc_kb': 200.0}}
+        failures = check_budgets(self.results, baseline)
+        self.assertEqual(len(failures), 2)
+        self.assertIn('p95_ms', failures[0])
+        self.assertIn('queries', failures[1])
+
+    def test_endpoint_without_budget_fails(self):
+        self.assertEqual(check_budgets(self.results, {}), ['home_view: no budget in baseline'])
@@ -15,4 +15,10 @@ python manage.py createcachetable
 python manage.py migrate
 
 # Populate sample text content
-python manage.py populate_texts
\ No newline at end of file
+python manage.py populate_texts
+
+# Fill composite scores on sessions recorded before the column existed
+python manage.py backfill_composite_scores
+
+# Materialize leaderboards for the open periods
+python manage.py rerank_leaderboards --rebuild
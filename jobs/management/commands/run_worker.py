@@ -0,0 +1,81 @@
+import os
+import signal
+import socket
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from jobs.models import Job
+from jobs.queue import run_jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs from the database job queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='Number of worker threads (default: 1)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=50,
+            help='Jobs claimed per poll (default: 50)'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=1.0,
+            help='Seconds to wait when the queue is empty (default: 1.0)'
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=600,
+            help='Requeue running jobs locked longer than this many seconds (default: 600)'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no jobs are due instead of polling forever'
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = threading.Event()
+        self.totals = [0, 0]
+        self.totals_lock = threading.Lock()
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+
+        signal.signal(signal.SIGTERM, lambda *_: self.stopping.set())
+        signal.signal(signal.SIGINT, lambda *_: self.stopping.set())
+
+        released = Job.release_stale(options['stale_after'])
+        if released:
+            self.stdout.write(f'Requeued {released} stale jobs')
+
+        threads = [
+            threading.Thread(target=self.work, args=(f'{worker_id}:{n}', options), daemon=True)
+            for n in range(max(1, options['concurrency']))
+        ]
+        for thread in threads:
+            thread.start()
+        while any(thread.is_alive() for thread in threads):
+            # Finish the jobs in hand before exiting on a signal
+            for thread in threads:
+                thread.join(timeout=0.5)
+
+        succeeded, failed = self.totals
+        self.stdout.write(self.style.SUCCESS(f'Worker stopped: {succeeded} jobs succeeded, {failed} failed'))
+
+    def work(self, worker_id, options):
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+                jobs = Job.claim(worker_id, options['batch_size'])
+                if not jobs:
+                    if options['burst']:
+                        return
+                    self.stopping.wait(options['sleep'])
+                    continue
+
+                succeeded, failed = run_jobs(jobs)
+                with self.totals_lock:
+                    self.totals[0] += succeeded
+                    self.totals[1] += failed
+        finally:
+            connection.close()
@@ -0,0 +1,141 @@
+import threading
+import uuid
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.db import models, connection, transaction, IntegrityError
+from django.utils import timezone
+
+_sqlite_writer = threading.Lock()
+
+
+def single_writer():
+    """
+    Lock held around job writes on SQLite, which allows one writer at a time:
+    worker threads queue up here instead of failing with 'database is locked'.
+    Other databases lock rows and need no process-wide lock.
+    """
+    return _sqlite_writer if connection.vendor == 'sqlite' else nullcontext()
+
+
+class Job(models.Model):
+    """Deferred unit of work, claimed and run by `manage.py run_worker`"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100, db_index=True)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+
+    # Jobs with the same key are coalesced while one is queued
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+
+    # Retries
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    last_error = models.TextField(blank=True)
+
+    # Scheduling and claiming
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, null=True, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'jobs'
+        indexes = [
+            models.Index(fields=['status', 'run_at']),  # Claiming due jobs
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['dedupe_key'], name='job_queued_dedupe_key',
+                                    condition=models.Q(status='queued')),
+        ]
+        ordering = ['run_at', 'id']
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, name, payload=None, dedupe_key=None, delay=0, max_attempts=3):
+        """
+        Queue a job. With `dedupe_key`, nothing is added while a queued job
+        with the same key exists; returns None in that case.
+        """
+        job = cls(
+            name=name,
+            payload=payload or {},
+            dedupe_key=dedupe_key,
+            run_at=timezone.now() + timedelta(seconds=delay),
+            max_attempts=max_attempts,
+        )
+        if dedupe_key is None:
+            job.save()
+            return job
+        try:
+            with transaction.atomic():
+                job.save()
+            return job
+        except IntegrityError:
+            return None
+
+    @classmethod
+    def claim(cls, worker_id, limit):
+        """
+        Mark up to `limit` due jobs as running for `worker_id` and return them.
+
+        PostgreSQL picks rows with SELECT ... FOR UPDATE SKIP LOCKED so workers
+        never wait on each other. Elsewhere (SQLite) the pick-and-mark is a
+        single UPDATE, which the database's single writer lock serializes.
+        """
+        now = timezone.now()
+        due = cls.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'id')
+        token = f'{worker_id}:{uuid.uuid4().hex[:8]}'
+        mark = {
+            'status': 'running',
+            'locked_by': token,
+            'locked_at': now,
+            'attempts': models.F('attempts') + 1,
+            'updated_at': now,
+        }
+
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+                cls.objects.filter(id__in=ids).update(**mark)
+        else:
+            with single_writer():
+                cls.objects.filter(
+                    id__in=models.Subquery(due.values('id')[:limit]), status='queued'
+                ).update(**mark)
+
+        return list(cls.objects.filter(status='running', locked_by=token).order_by('run_at', 'id'))
+
+    @classmethod
+    def release_stale(cls, timeout):
+        """Requeue jobs whose worker stopped more than `timeout` seconds ago"""
+        cutoff = timezone.now() - timedelta(seconds=timeout)
+        return cls.objects.filter(status='running', locked_at__lt=cutoff).update(
+            status='queued', locked_by=None, locked_at=None
+        )
+
+    def retry_or_fail(self, error):
+        """Reschedule with exponential backoff, or mark failed after the last attempt"""
+        self.last_error = error
+        self.locked_by = None
+        self.locked_at = None
+        if self.attempts < self.max_attempts:
+            self.status = 'queued'
+            self.run_at = timezone.now() + timedelta(seconds=5 * 2 ** self.attempts)
+        else:
+            self.status = 'failed'
+        with single_writer():
+            try:
+                self.save(update_fields=['status', 'run_at', 'last_error', 'locked_by', 'locked_at', 'updated_at'])
+            except IntegrityError:
+                # An equivalent job was queued meanwhile; that one will do the work
+                self.delete()
@@ -0,0 +1,83 @@
+"""
+Handler registry and runner for the database job queue.
+
+Apps register handlers in a ``jobs`` module (discovered at startup)::
+
+    @register('leaderboard.rerank')
+    def rerank(payload): ...
+
+    @register('typing_test.record_sessions', batch=True)
+    def record(payloads): ...
+
+Batch handlers receive the payloads of every claimed job with that name at
+once. A handler's database writes and the removal of its jobs commit in one
+transaction, so a job is never applied twice; failures are retried with
+backoff by ``Job.retry_or_fail``.
+"""
+import logging
+import traceback
+
+from django.db import transaction
+
+from .models import Job, single_writer
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+class Handler:
+    def __init__(self, func, batch):
+        self.func = func
+        self.batch = batch
+
+
+def register(name, batch=False):
+    """Register the decorated function as the handler for jobs called `name`"""
+    def decorator(func):
+        HANDLERS[name] = Handler(func, batch)
+        return func
+    return decorator
+
+
+def enqueue(name, payload=None, **kwargs):
+    """Queue a job for a registered handler (see Job.enqueue for options)"""
+    if name not in HANDLERS:
+        raise KeyError(f'No job handler registered for {name!r}')
+    return Job.enqueue(name, payload, **kwargs)
+
+
+def run_jobs(jobs):
+    """Run claimed jobs, grouped by name; returns (succeeded, failed) counts"""
+    groups = {}
+    for job in jobs:
+        groups.setdefault(job.name, []).append(job)
+
+    succeeded = failed = 0
+    for name, group in groups.items():
+        handler = HANDLERS.get(name)
+        if handler is None:
+            for job in group:
+                job.retry_or_fail(f'No handler registered for {name!r}')
+            failed += len(group)
+            continue
+
+        # Batch handlers take the whole group; others run job by job
+        units = [group] if handler.batch else [[job] for job in group]
+        for unit in units:
+            try:
+                with single_writer(), transaction.atomic():
+                    if handler.batch:
+                        handler.func([job.payload for job in unit])
+                    else:
+                        handler.func(unit[0].payload)
+                    Job.objects.filter(id__in=[job.id for job in unit]).delete()
+                succeeded += len(unit)
+            except Exception:
+                logger.exception('Job %s failed', name)
+                error = traceback.format_exc(limit=5)
+                for job in unit:
+                    job.retry_or_fail(error)
+                failed += len(unit)
+
+    return succeeded, failed
@@ -0,0 +1,105 @@
+import io
+import signal
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from .models import Job
+from .queue import enqueue, register, run_jobs
+
+calls = []
+
+
+@register('jobs.tests.record')
+def record(payload):
+    calls.append(payload)
+
+
+@register('jobs.tests.record_batch', batch=True)
+def record_batch(payloads):
+    calls.append(payloads)
+
+
+@register('jobs.tests.fail')
+def fail(payload):
+    # Written inside the job's transaction, so it must be rolled back
+    Job.objects.create(name='jobs.tests.record', payload={'leaked': True})
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def claim(self):
+        return Job.claim('test-worker', 10)
+
+    def test_unregistered_job_cannot_be_queued(self):
+        with self.assertRaises(KeyError):
+            enqueue('jobs.tests.missing')
+
+    def test_queued_dedupe_key_coalesces_jobs(self):
+        self.assertIsNotNone(enqueue('jobs.tests.record', {'n': 1}, dedupe_key='k'))
+        self.assertIsNone(enqueue('jobs.tests.record', {'n': 2}, dedupe_key='k'))
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_delayed_jobs_are_not_claimed_early(self):
+        enqueue('jobs.tests.record', {'n': 1}, delay=60)
+        self.assertEqual(self.claim(), [])
+
+    def test_jobs_run_once_and_are_removed(self):
+        enqueue('jobs.tests.record', {'n': 1})
+        enqueue('jobs.tests.record', {'n': 2})
+        self.assertEqual(run_jobs(self.claim()), (2, 0))
+        self.assertEqual(calls, [{'n': 1}, {'n': 2}])
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(self.claim(), [])
+
+    def test_batch_handler_gets_every_payload_at_once(self):
+        for n in range(3):
+            enqueue('jobs.tests.record_batch', {'n': n})
+        self.assertEqual(run_jobs(self.claim()), (3, 0))
+        self.assertEqual(calls, [[{'n': 0}, {'n': 1}, {'n': 2}]])
+
+    def test_failures_roll_back_and_retry_with_backoff_then_fail(self):
+        job = enqueue('jobs.tests.fail', max_attempts=2)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertEqual(run_jobs(self.claim()), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+        self.assertEqual(Job.objects.count(), 1)
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_jobs(self.claim())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_stale_running_jobs_are_requeued(self):
+        enqueue('jobs.tests.record')
+        self.claim()
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(Job.release_stale(600), 1)
+        self.assertEqual(len(self.claim()), 1)
+
+
+class RunWorkerTests(TransactionTestCase):
+    """Worker threads use their own connections, so jobs must really be committed"""
+
+    def setUp(self):
+        calls.clear()
+        # run_worker installs its own SIGINT/SIGTERM handlers
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+
+    def test_burst_worker_drains_the_queue(self):
+        for n in range(3):
+            enqueue('jobs.tests.record', {'n': n})
+        out = io.StringIO()
+        call_command('run_worker', '--burst', stdout=out)
+        self.assertEqual(len(calls), 3)
+        self.assertIn('3 jobs succeeded', out.getvalue())
@@ -0,0 +1,59 @@
+"""
+Versioned cache keys for leaderboard boards.
+
+Each (duration, period) board has a version number in the shared cache and
+rendered pages are cached under keys that include it. A completion bumps the
+version only when its score can enter the cached top pages, so boards stay
+fresh without waiting for a timer.
+"""
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(duration, period):
+    return f'leaderboard:version:{duration}:{period}'
+
+
+def _cutoff_key(duration, period):
+    return f'leaderboard:cutoff:{duration}:{period}'
+
+
+def board_version(duration, period):
+    version = cache.get(_version_key(duration, period))
+    if version is None:
+        # Seed with a timestamp so a lost key never matches old cached pages
+        cache.add(_version_key(duration, period), int(time.time() * 1000), None)
+        version = cache.get(_version_key(duration, period))
+    return version
+
+
+def bump_board_version(duration, period):
+    try:
+        cache.incr(_version_key(duration, period))
+    except ValueError:
+        cache.add(_version_key(duration, period), int(time.time() * 1000), None)
+    cache.delete(_cutoff_key(duration, period))
+
+
+def board_cache_key(duration, period, period_start, cursor, limit):
+    """Cache key for one page of a board at its current version"""
+    version = board_version(duration, period)
+    return f'{duration}:{period}:{period_start.timestamp():.0f}:{version}:{limit}:{cursor or ""}'
+
+
+def note_board_cutoff(duration, period, rows, limit):
+    """Record the lowest score shown on a cached first page"""
+    # A short board means any new entry changes what is shown
+    cutoff = rows[-1]['composite_score'] if len(rows) >= limit else float('-inf')
+    current = cache.get(_cutoff_key(duration, period))
+    if current is None or cutoff < current:
+        cache.set(_cutoff_key(duration, period), cutoff, None)
+
+
+def invalidate_boards(duration, periods, score):
+    """Bump the version of each board whose cached top pages `score` reaches"""
+    for period in periods:
+        cutoff = cache.get(_cutoff_key(duration, period))
+        if cutoff is None or score >= cutoff:
+            bump_board_version(duration, period)
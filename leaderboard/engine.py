@@ -0,0 +1,99 @@
+"""
+Leaderboard queries.
+
+Per-user bests are computed in the database (DISTINCT ON on PostgreSQL, a
+ROW_NUMBER() window elsewhere, and a streamed fallback for SQLite builds
+without window functions). Boards are paged by keyset on
+(-composite_score, id) so deep pages never scan an OFFSET.
+"""
+from django.db import connections
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import LeaderboardEntry
+
+BEST_SESSION_FIELDS = ('id', 'user_id', 'wpm', 'accuracy', 'composite_score')
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Raised for a malformed pagination cursor"""
+
+
+def best_sessions_per_user(sessions):
+    """
+    Yield ``(session_id, user_id, wpm, accuracy, composite_score)`` for each
+    user's highest-scoring session in the `sessions` queryset.
+    """
+    sessions = sessions.filter(user__isnull=False)
+    connection = connections[sessions.db]
+
+    if connection.vendor == 'postgresql':
+        return sessions.order_by('user_id', '-composite_score', 'id').distinct('user_id').values_list(
+            *BEST_SESSION_FIELDS
+        ).iterator(chunk_size=5000)
+
+    if connection.features.supports_over_clause:
+        return sessions.annotate(
+            user_row=Window(RowNumber(), partition_by=F('user_id'), order_by=[F('composite_score').desc(), F('id').asc()])
+        ).filter(user_row=1).values_list(*BEST_SESSION_FIELDS).iterator(chunk_size=5000)
+
+    return _first_per_user(
+        sessions.order_by('user_id', '-composite_score', 'id').values_list(*BEST_SESSION_FIELDS).iterator(chunk_size=5000)
+    )
+
+
+def _first_per_user(rows):
+    last_user_id = None
+    for row in rows:
+        if row[1] != last_user_id:
+            last_user_id = row[1]
+            yield row
+
+
+def encode_cursor(entry, position):
+    return f"{entry['composite_score']}:{entry['id']}:{position}"
+
+
+def decode_cursor(cursor):
+    """Return (composite_score, entry_id, position) from a cursor string"""
+    try:
+        score, entry_id, position = cursor.split(':')
+        return float(score), int(entry_id), int(position)
+    except ValueError:
+        raise InvalidCursor(cursor)
+
+
+def get_board_page(duration, period, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Return ``(rows, next_cursor)`` for one page of a materialized board.
+
+    Each row carries its 1-based ``rank`` position on the board.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    period_start, period_end = LeaderboardEntry.period_bounds(period)
+    entries = LeaderboardEntry.objects.filter(
+        duration=duration,
+        period=period,
+        period_start=period_start
+    )
+
+    position = 0
+    if cursor:
+        score, entry_id, position = decode_cursor(cursor)
+        entries = entries.filter(Q(composite_score__lt=score) | Q(composite_score=score, id__gt=entry_id))
+
+    rows = list(
+        entries.order_by('-composite_score', 'id').values(
+            'id', 'user__username', 'wpm', 'accuracy', 'composite_score'
+        )[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    for offset, row in enumerate(rows, start=1):
+        row['rank'] = position + offset
+
+    next_cursor = encode_cursor(rows[-1], rows[-1]['rank']) if has_more else None
+    return rows, next_cursor
@@ -0,0 +1,26 @@
+"""Background job handlers for leaderboards (run by `manage.py run_worker`)"""
+from django.core.cache import cache
+
+from jobs.queue import enqueue, register
+
+from .models import LeaderboardEntry
+
+# Seconds to wait before re-ranking, so a burst of completions shares one re-rank
+RERANK_DELAY = 30
+
+
+@register('leaderboard.rerank')
+def rerank(payload):
+    """Rewrite stored ranks for the open period of one board"""
+    period_start, _ = LeaderboardEntry.period_bounds(payload['period'])
+    LeaderboardEntry.rerank(payload['duration'], payload['period'], period_start)
+
+
+def enqueue_rerank(duration, period):
+    """Queue a re-rank of a board whose entries changed, at most once per RERANK_DELAY"""
+    key = f'leaderboard.rerank:{duration}:{period}'
+    # The queued job re-ranks everything written before it runs, so later
+    # changes in the window skip the queue insert entirely
+    if not cache.add(key, True, RERANK_DELAY):
+        return
+    enqueue('leaderboard.rerank', {'duration': duration, 'period': period}, dedupe_key=key, delay=RERANK_DELAY)
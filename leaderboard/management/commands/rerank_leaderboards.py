@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from leaderboard.board_cache import bump_board_version
+from leaderboard.engine import best_sessions_per_user
+from leaderboard.models import LeaderboardEntry
+from typing_test.models import TestSession
+
+
+class Command(BaseCommand):
+    help = 'Rewrite rank and total_entries for materialized leaderboards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all-periods', action='store_true',
+            help='Re-rank every stored period, not only the currently open ones'
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Rebuild open-period entries from completed test sessions before ranking'
+        )
+
+    def handle(self, *args, **options):
+        boards = set()
+        for duration, _ in LeaderboardEntry.DURATION_CHOICES:
+            for period, _ in LeaderboardEntry.PERIOD_CHOICES:
+                period_start, period_end = LeaderboardEntry.period_bounds(period)
+                if options['rebuild']:
+                    self.rebuild(duration, period, period_start, period_end)
+                boards.add((duration, period, period_start))
+
+        if options['all_periods']:
+            boards.update(
+                LeaderboardEntry.objects.values_list('duration', 'period', 'period_start').distinct()
+            )
+
+        ranked = 0
+        for duration, period, period_start in sorted(boards):
+            ranked += LeaderboardEntry.rerank(duration, period, period_start)
+
+        self.stdout.write(self.style.SUCCESS(f'Re-ranked {ranked} entries across {len(boards)} leaderboards'))
+
+    def rebuild(self, duration, period, period_start, period_end):
+        """Recreate one board from each user's best session in the period"""
+        sessions = TestSession.objects.filter(
+            duration=duration,
+            completed=True,
+            flagged=False,
+            completed_at__gte=period_start,
+            completed_at__lt=period_end,
+        )
+
+        entries = [
+            LeaderboardEntry(
+                user_id=user_id,
+                duration=duration,
+                period=period,
+                wpm=wpm,
+                accuracy=accuracy,
+                composite_score=composite_score,
+                rank=0,
+                total_entries=0,
+                test_session_id=session_id,
+                period_start=period_start,
+                period_end=period_end,
+            )
+            for session_id, user_id, wpm, accuracy, composite_score in best_sessions_per_user(sessions)
+        ]
+        with transaction.atomic():
+            LeaderboardEntry.objects.filter(duration=duration, period=period, period_start=period_start).delete()
+            LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+        bump_board_version(duration, period)
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0001_initial'),
+        ('typing_test', '0004_userstats_running_sums'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['duration', 'period', 'period_start', '-composite_score'], name='leaderboard_duratio_a3dd89_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:55
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leaderboard', '0002_leaderboard_board_index'),
+        ('typing_test', '0004_userstats_running_sums'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='leaderboardentry',
+            name='leaderboard_duratio_a3dd89_idx',
+        ),
+        migrations.AddIndex(
+            model_name='leaderboardentry',
+            index=models.Index(fields=['duration', 'period', 'period_start', '-composite_score', 'id'], name='leaderboard_duratio_7a8ed1_idx'),
+        ),
+    ]
@@ -1,9 +1,15 @@
-from django.db import models
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.db import connection, models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from typing_test.models import TestSession
 
 User = get_user_model()
 
+# Fixed bounds for the single all-time period
+ALL_TIME_START = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+ALL_TIME_END = datetime(9999, 12, 31, tzinfo=dt_timezone.utc)
+
 
 class LeaderboardEntry(models.Model):
     """Cached leaderboard entries for performance optimization"""
@@ -44,6 +50,7 @@ class LeaderboardEntry(models.Model):
         unique_together = ['user', 'duration', 'period', 'period_start']
         indexes = [
             models.Index(fields=['duration', 'period', '-composite_score']),
+            models.Index(fields=['duration', 'period', 'period_start', '-composite_score', 'id']),  # Board pages
             models.Index(fields=['period_start', 'period_end']),
             models.Index(fields=['-wpm']),
             models.Index(fields=['rank']),
@@ -56,4 +63,160 @@ class LeaderboardEntry(models.Model):
     @classmethod
     def calculate_composite_score(cls, wpm, accuracy):
         """Calculate weighted composite score (70% WPM, 30% accuracy)"""
-        return round((wpm * 0.7) + (accuracy * 0.3), 2)
+        return TestSession.calculate_composite_score(wpm, accuracy)
+    
+    @classmethod
+    def period_bounds(cls, period, when=None):
+        """Return the (start, end) of the `period` containing `when` (default: now)"""
+        if period == 'all_time':
+            return ALL_TIME_START, ALL_TIME_END
+        
+        day = timezone.localtime(when or timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+        if period == 'daily':
+            return day, day + timedelta(days=1)
+        if period == 'weekly':
+            start = day - timedelta(days=day.weekday())
+            return start, start + timedelta(days=7)
+        if period == 'monthly':
+            start = day.replace(day=1)
+            return start, (start + timedelta(days=32)).replace(day=1)
+        raise ValueError(f'Unknown leaderboard period: {period}')
+    
+    @classmethod
+    def record_session(cls, session):
+        """
+        Upsert the user's entry in every open period if the session beats it.
+        
+        New entries are stored with rank 0 until the re-rank that callers
+        queue with ``leaderboard.jobs.enqueue_rerank``. Returns the periods
+        whose entry changed.
+        """
+        changed = []
+        if not session.user_id or not session.completed or session.flagged:
+            return changed
+        
+        for period, _ in cls.PERIOD_CHOICES:
+            if cls._upsert(session, period):
+                changed.append(period)
+        return changed
+    
+    @classmethod
+    def record_sessions(cls, sessions):
+        """
+        Like record_session for a batch: only the best session of each
+        (user, duration, period, period start) is written. Returns
+        {duration: periods whose entry changed}.
+        """
+        best = {}
+        for session in sessions:
+            if not session.user_id or not session.completed or session.flagged:
+                continue
+            for period, _ in cls.PERIOD_CHOICES:
+                period_start, _ = cls.period_bounds(period, session.completed_at)
+                key = (session.user_id, session.duration, period, period_start)
+                if key not in best or session.composite_score > best[key].composite_score:
+                    best[key] = session
+        
+        changed = {}
+        for (_, duration, period, _), session in best.items():
+            if cls._upsert(session, period):
+                periods = changed.setdefault(duration, [])
+                if period not in periods:
+                    periods.append(period)
+        return changed
+    
+    @classmethod
+    def withdraw_sessions(cls, sessions):
+        """
+        Replace entries held by (now flagged) sessions with each user's next
+        best unflagged session in the period, or delete them. Returns the
+        (duration, period) boards that changed.
+        """
+        changed = set()
+        entries = cls.objects.filter(test_session_id__in=[session.id for session in sessions])
+        for entry in entries:
+            replacement = TestSession.objects.filter(
+                user_id=entry.user_id,
+                duration=entry.duration,
+                completed=True,
+                flagged=False,
+                completed_at__gte=entry.period_start,
+                completed_at__lt=entry.period_end,
+            ).order_by('-composite_score', 'completed_at').first()
+            if replacement is None:
+                entry.delete()
+            else:
+                entry.wpm = replacement.wpm
+                entry.accuracy = replacement.accuracy
+                entry.composite_score = replacement.composite_score
+                entry.test_session_id = replacement.id
+                entry.save(update_fields=['wpm', 'accuracy', 'composite_score', 'test_session'])
+            changed.add((entry.duration, entry.period))
+        return changed
+    
+    @classmethod
+    def _upsert(cls, session, period):
+        """Write the session into one period's entry if it beats it; True if changed"""
+        period_start, period_end = cls.period_bounds(period, session.completed_at)
+        values = {
+            'wpm': session.wpm,
+            'accuracy': session.accuracy,
+            'composite_score': session.composite_score,
+            'test_session_id': session.id,
+        }
+        key = {
+            'user_id': session.user_id,
+            'duration': session.duration,
+            'period': period,
+            'period_start': period_start,
+        }
+        
+        if connection.features.supports_update_conflicts_with_target:
+            # One conditional upsert: the row count is 1 if the entry was created or beaten
+            row = {**key, 'period_end': period_end, 'rank': 0, 'total_entries': 0, 'created_at': timezone.now(), **values}
+            with connection.cursor() as cursor:
+                cursor.execute(cls._upsert_sql(row), [
+                    cls._meta.get_field(name).get_db_prep_save(value, connection) for name, value in row.items()
+                ])
+                return cursor.rowcount > 0
+        
+        better_than = cls.objects.filter(**key, composite_score__lt=session.composite_score)
+        if better_than.update(**values):
+            return True
+        entry, created = cls.objects.get_or_create(
+            **key, defaults={'period_end': period_end, 'rank': 0, 'total_entries': 0, **values}
+        )
+        if created or entry.composite_score >= session.composite_score:
+            return created
+        # Created concurrently with a lower score
+        return better_than.update(**values) > 0
+    
+    @classmethod
+    def _upsert_sql(cls, row):
+        """INSERT of `row` that on a clash with the unique key only overwrites a lower composite_score"""
+        quote = connection.ops.quote_name
+        table = quote(cls._meta.db_table)
+        columns = [quote(cls._meta.get_field(name).column) for name in row]
+        conflict = [quote(cls._meta.get_field(name).column) for name in cls._meta.unique_together[0]]
+        updated = [quote(cls._meta.get_field(name).column) for name in ('wpm', 'accuracy', 'composite_score', 'test_session')]
+        score = quote('composite_score')
+        return (
+            f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join(["%s"] * len(columns))}) '
+            f'ON CONFLICT ({", ".join(conflict)}) DO UPDATE SET '
+            f'{", ".join(f"{column} = EXCLUDED.{column}" for column in updated)} '
+            f'WHERE {table}.{score} < EXCLUDED.{score}'
+        )
+    
+    @classmethod
+    def rerank(cls, duration, period, period_start):
+        """Rewrite rank and total_entries for one board in bulk"""
+        entries = list(
+            cls.objects.filter(duration=duration, period=period, period_start=period_start)
+            .order_by('-composite_score', '-wpm', 'created_at')
+            .only('id')
+        )
+        for position, entry in enumerate(entries, start=1):
+            entry.rank = position
+            entry.total_entries = len(entries)
+        cls.objects.bulk_update(entries, ['rank', 'total_entries'], batch_size=1000)
+        return len(entries)
@@ -0,0 +1,105 @@
+"""
+Per-process rank lookups for materialized leaderboards.
+
+Each (duration, period) board is held as a sorted array of composite scores
+plus a user -> score map, so a user's rank is a single bisect. Boards are
+loaded from ``LeaderboardEntry`` on first use, kept in step with completions
+handled by this worker, and reloaded periodically to pick up other workers'.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from .models import LeaderboardEntry
+
+# Seconds before a board is reloaded to pick up other workers' completions
+REFRESH_INTERVAL = 60
+
+
+class RankBoard:
+    """Sorted scores for one board plus each user's (score, wpm, accuracy)"""
+
+    def __init__(self, period_start, rows):
+        self.period_start = period_start
+        self.loaded_at = time.monotonic()
+        self.users = {user_id: (score, wpm, accuracy) for user_id, score, wpm, accuracy in rows}
+        self.scores = sorted(entry[0] for entry in self.users.values())
+
+    def __len__(self):
+        return len(self.scores)
+
+    def rank(self, user_id):
+        """1-based rank of the user, or None if they are not on the board"""
+        entry = self.users.get(user_id)
+        if entry is None:
+            return None
+        return len(self.scores) - bisect_right(self.scores, entry[0]) + 1
+
+    def record(self, user_id, score, wpm, accuracy):
+        """Apply a new result if it beats the user's current best"""
+        current = self.users.get(user_id)
+        if current is not None:
+            if current[0] >= score:
+                return
+            del self.scores[bisect_left(self.scores, current[0])]
+        insort(self.scores, score)
+        self.users[user_id] = (score, wpm, accuracy)
+
+
+class RankService:
+    """Rank lookups for every open (duration, period) board"""
+
+    def __init__(self, refresh_interval=REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._boards = {}
+
+    def lookup(self, user_id, duration, period):
+        """Return rank, total, percentile, wpm and accuracy for a user"""
+        board = self._get_board(duration, period)
+        rank = board.rank(user_id)
+        if rank is None:
+            return {'rank': None, 'total': len(board), 'percentile': None, 'wpm': None, 'accuracy': None}
+
+        score, wpm, accuracy = board.users[user_id]
+        return {
+            'rank': rank,
+            'total': len(board),
+            'percentile': round(100.0 * (len(board) - rank + 1) / len(board), 2),
+            'wpm': wpm,
+            'accuracy': accuracy,
+        }
+
+    def record_session(self, session):
+        """Keep loaded boards in step with a completed session"""
+        if not session.user_id or not session.completed:
+            return
+        for period, _ in LeaderboardEntry.PERIOD_CHOICES:
+            board = self._boards.get((session.duration, period))
+            period_start, _ = LeaderboardEntry.period_bounds(period, session.completed_at)
+            if board is not None and board.period_start == period_start:
+                with self._lock:
+                    board.record(session.user_id, session.composite_score, session.wpm, session.accuracy)
+
+    def invalidate(self):
+        self._boards = {}
+
+    def _get_board(self, duration, period):
+        period_start, _ = LeaderboardEntry.period_bounds(period)
+        board = self._boards.get((duration, period))
+        if (board is not None and board.period_start == period_start
+                and time.monotonic() - board.loaded_at < self.refresh_interval):
+            return board
+
+        rows = LeaderboardEntry.objects.filter(
+            duration=duration,
+            period=period,
+            period_start=period_start
+        ).values_list('user_id', 'composite_score', 'wpm', 'accuracy')
+        board = RankBoard(period_start, rows.iterator(chunk_size=5000))
+        with self._lock:
+            self._boards[(duration, period)] = board
+        return board
+
+
+rank_service = RankService()
@@ -1,3 +1,68 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+from jobs.models import Job
+from jobs.queue import run_jobs
+from typing_test.models import TestSession
+
+from .models import LeaderboardEntry
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+class LeaderboardUpdateTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('typist', 'typist@example.com', 'Passw0rdX')
+
+    def session(self, user, wpm, accuracy=100.0, duration=30):
+        return TestSession.objects.create(
+            user=user, duration=duration, wpm=wpm, accuracy=accuracy, typing_time=duration,
+            completed=True, completed_at=timezone.now(),
+            composite_score=TestSession.calculate_composite_score(wpm, accuracy),
+        )
+
+    def test_entry_only_changes_when_beaten(self):
+        first = self.session(self.user, 50.0)
+        self.assertEqual(len(LeaderboardEntry.record_session(first)), 4)
+        self.assertEqual(LeaderboardEntry.record_session(self.session(self.user, 40.0)), [])
+        better = self.session(self.user, 60.0)
+        self.assertEqual(len(LeaderboardEntry.record_session(better)), 4)
+        self.assertEqual(
+            set(LeaderboardEntry.objects.filter(user=self.user).values_list('test_session_id', flat=True)),
+            {better.id},
+        )
+
+    def test_completion_queues_one_rerank_per_board(self):
+        self.client.force_login(self.user)
+        for wpm in [2, 3]:
+            session_id = self.client.post(
+                '/typing/api/start/', json.dumps({'duration': 30, 'text_content': 'one two'}),
+                content_type='application/json',
+            ).json()['session_id']
+            response = self.client.post(
+                '/typing/api/complete/',
+                json.dumps({'session_id': session_id, 'typed_text': 'one two'[:wpm], 'actual_time': 30}),
+                content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 200)
+
+        jobs = Job.objects.filter(name='leaderboard.rerank')
+        self.assertEqual(sorted(job.payload['period'] for job in jobs), sorted(p for p, _ in LeaderboardEntry.PERIOD_CHOICES))
+        self.assertEqual(set(LeaderboardEntry.objects.values_list('rank', flat=True)), {0})
+
+        Job.objects.update(run_at=timezone.now())
+        self.assertEqual(run_jobs(Job.claim('test', 10)), (4, 0))
+        self.assertEqual(set(LeaderboardEntry.objects.values_list('rank', 'total_entries')), {(1, 1)})
+
+    def test_rerank_orders_by_score(self):
+        other = User.objects.create_user('other', 'other@example.com', 'Passw0rdX')
+        LeaderboardEntry.record_session(self.session(self.user, 40.0))
+        LeaderboardEntry.record_session(self.session(other, 70.0))
+        period_start, _ = LeaderboardEntry.period_bounds('daily')
+        self.assertEqual(LeaderboardEntry.rerank(30, 'daily', period_start), 2)
+        ranks = dict(LeaderboardEntry.objects.filter(period='daily').values_list('user__username', 'rank'))
+        self.assertEqual(ranks, {'other': 1, 'typist': 2})
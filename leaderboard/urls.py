@@ -6,5 +6,5 @@ app_name = 'leaderboard'
 urlpatterns = [
     path('', views.leaderboard_view, name='index'),
     path('api/', views.get_leaderboard_api, name='api'),
-    path('api/batch-update/', views.batch_update_leaderboard, name='batch_update'),
+    path('api/user-rank/', views.get_user_rank_api, name='user_rank'),
 ]
\ No newline at end of file
@@ -1,10 +1,21 @@
 from django.shortcuts import render
 from django.http import JsonResponse
-from django.views.decorators.cache import cache_page
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
-from typing_test.models import TestSession
-import json
+from .models import LeaderboardEntry
+from .engine import get_board_page, InvalidCursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .board_cache import board_cache_key, note_board_cutoff
+from neotype.caching import swr_cache_page
+from .ranks import rank_service
+from typing_test.models import UserStats
+
+# Period names used by the leaderboard page
+PERIOD_ALIASES = {
+    'all': 'all_time',
+    '30': 'monthly',
+    '7': 'weekly',
+    'today': 'daily',
+}
 
 
 def leaderboard_view(request):
@@ -12,72 +23,94 @@ def leaderboard_view(request):
     return render(request, 'leaderboard/index.html')
 
 
-@cache_page(60 * 5)  # Cache for 5 minutes
+def parse_board_params(request):
+    """Return (duration, period, cursor, limit), or None if they are invalid"""
+    try:
+        duration = int(request.GET.get('duration', 30))
+        limit = max(1, min(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        return None
+    period = request.GET.get('period', 'all_time')
+    period = PERIOD_ALIASES.get(period, period)
+    if period not in dict(LeaderboardEntry.PERIOD_CHOICES):
+        return None
+    return duration, period, request.GET.get('cursor'), limit
+
+
+def leaderboard_cache_key(request):
+    """Versioned cache key for a board page (None skips the cache)"""
+    params = parse_board_params(request)
+    if params is None:
+        return None
+    duration, period, cursor, limit = params
+    period_start, period_end = LeaderboardEntry.period_bounds(period)
+    return board_cache_key(duration, period, period_start, cursor, limit)
+
+
 @require_http_methods(["GET"])
+@swr_cache_page(ttl=60, stale_ttl=5 * 60, key_func=leaderboard_cache_key)
 def get_leaderboard_api(request):
     """Minimal leaderboard endpoint - client does most of the work"""
-    duration = int(request.GET.get('duration', 30))
+    params = parse_board_params(request)
+    if params is None:
+        return JsonResponse({'error': 'Invalid leaderboard parameters'}, status=400)
+    duration, period, cursor, limit = params
     
-    # Only return essential data
-    top_sessions = TestSession.objects.filter(
-        duration=duration,
-        completed=True
-    ).select_related('user').order_by('-wpm')[:50]
+    # One indexed range read on the materialized board for the open period
+    try:
+        rows, next_cursor = get_board_page(duration, period, cursor=cursor, limit=limit)
+    except InvalidCursor:
+        return JsonResponse({'error': 'Invalid page'}, status=400)
     
-    leaderboard = []
-    for session in top_sessions:
-        # Calculate composite score server-side for consistency
-        score = int((session.wpm * 0.7) + (session.accuracy * 0.3))
-        
-        username = session.user.username if session.user else f"Guest-{session.session_key[:8]}"
-        
-        leaderboard.append({
-            'username': username,
-            'wpm': session.wpm,
-            'accuracy': session.accuracy,
-            'score': score
-        })
+    if not cursor:
+        note_board_cutoff(duration, period, rows, limit)
     
-    # Sort by composite score
-    leaderboard.sort(key=lambda x: x['score'], reverse=True)
+    leaderboard = [
+        {
+            'rank': row['rank'],
+            'username': row['user__username'],
+            'wpm': row['wpm'],
+            'accuracy': row['accuracy'],
+            'score': int(row['composite_score'])
+        }
+        for row in rows
+    ]
     
     return JsonResponse({
-        'leaderboard': leaderboard[:50],  # Top 50 only
-        'timestamp': timezone.now().isoformat(),
-        'cache_duration': 300  # 5 minutes
+        'leaderboard': leaderboard,
+        'period': period,
+        'next_cursor': next_cursor,
+        'timestamp': timezone.now().isoformat()
     })
 
 
-@require_http_methods(["POST"])
-def batch_update_leaderboard(request):
-    """Batch process leaderboard updates to minimize server load"""
+@require_http_methods(["GET"])
+def get_user_rank_api(request):
+    """Current user's rank on one board, served from the in-memory rank service"""
     if not request.user.is_authenticated:
         return JsonResponse({'error': 'Authentication required'}, status=401)
     
     try:
-        data = json.loads(request.body)
-        sessions = data.get('sessions', [])
-        
-        # Process only valid sessions
-        processed = 0
-        for session_data in sessions:
-            if validate_session_data(session_data):
-                # Update leaderboard logic here
-                processed += 1
-        
-        return JsonResponse({
-            'success': True,
-            'processed': processed
-        })
-        
-    except Exception as e:
-        return JsonResponse({'error': 'Processing failed'}, status=400)
-
-
-def validate_session_data(data):
-    """Basic validation for leaderboard data"""
-    return (
-        0 <= data.get('wpm', 0) <= 300 and
-        0 <= data.get('accuracy', 0) <= 100 and
-        data.get('duration') in [15, 30, 60]
-    )
+        duration = int(request.GET.get('duration', 30))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid duration'}, status=400)
+    period = request.GET.get('period', 'all_time')
+    period = PERIOD_ALIASES.get(period, period)
+    
+    if period not in dict(LeaderboardEntry.PERIOD_CHOICES):
+        return JsonResponse({'error': 'Invalid period'}, status=400)
+    
+    result = rank_service.lookup(request.user.id, duration, period)
+    
+    tests_completed = 0
+    if duration in UserStats.DURATIONS:
+        tests_completed = UserStats.objects.filter(user=request.user).values_list(
+            f'completed_tests_{duration}s', flat=True
+        ).first() or 0
+    
+    return JsonResponse({
+        **result,
+        'duration': duration,
+        'period': period,
+        'tests_completed': tests_completed,
+    })
@@ -0,0 +1,314 @@
+"""
+Custom cache backends.
+
+``TwoTierCache`` puts a bounded per-process LRU (L1) in front of another
+configured cache alias (L2, e.g. the shared ``DatabaseCache``). Only keys
+matching an ``L1_PREFIXES`` entry are kept in L1, each prefix with its own
+short TTL; everything else, including rate-limit counters and version keys,
+always goes to L2. Writes go through to L2 and atomic operations (``add``,
+``incr``) are only ever performed by L2.
+
+``SQLiteCache`` is a node-local cache shared by every worker process through
+one SQLite file in WAL mode, with atomic ``add``/``incr``, TTL expiry and
+size-bounded culling. It needs no external server.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+
+class TwoTierCache(BaseCache):
+    """
+    OPTIONS:
+        L2_ALIAS: alias of the shared cache in settings.CACHES
+        L1_MAX_ENTRIES: LRU size per process (default 1000)
+        L1_PREFIXES: {key prefix: L1 TTL in seconds}; longest prefix wins
+    """
+
+    def __init__(self, location, params):
+        options = dict(params.get('OPTIONS', {}))
+        self.l2_alias = options.pop('L2_ALIAS')
+        self.l1_max_entries = options.pop('L1_MAX_ENTRIES', 1000)
+        self.l1_prefixes = sorted(options.pop('L1_PREFIXES', {}).items(), key=lambda item: -len(item[0]))
+        super().__init__({**params, 'OPTIONS': options})
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    def l1_timeout(self, key):
+        """L1 TTL for a raw key, or 0 if the key is L2-only"""
+        for prefix, timeout in self.l1_prefixes:
+            if key.startswith(prefix):
+                return timeout
+        return 0
+
+    # L1 helpers
+
+    def _l1_get(self, l1_key):
+        with self._lock:
+            entry = self._l1.get(l1_key)
+            if entry is None:
+                return _MISSING
+            expires_at, pickled = entry
+            if expires_at <= time.monotonic():
+                del self._l1[l1_key]
+                return _MISSING
+            self._l1.move_to_end(l1_key)
+        return pickle.loads(pickled)
+
+    def _l1_set(self, l1_key, value, timeout):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._l1[l1_key] = (time.monotonic() + timeout, pickled)
+            self._l1.move_to_end(l1_key)
+            while len(self._l1) > self.l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _l1_discard(self, l1_key):
+        with self._lock:
+            self._l1.pop(l1_key, None)
+
+    def _l1_fill(self, key, value, version, timeout=DEFAULT_TIMEOUT):
+        l1_timeout = self.l1_timeout(key)
+        if not l1_timeout:
+            return
+        l1_key = self.make_and_validate_key(key, version)
+        if timeout is not DEFAULT_TIMEOUT and timeout is not None:
+            if timeout <= 0:
+                self._l1_discard(l1_key)
+                return
+            l1_timeout = min(l1_timeout, timeout)
+        self._l1_set(l1_key, value, l1_timeout)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        if self.l1_timeout(key):
+            value = self._l1_get(self.make_and_validate_key(key, version))
+            if value is not _MISSING:
+                return value
+
+        value = self.l2.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._l1_fill(key, value, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remaining = []
+        for key in keys:
+            value = _MISSING
+            if self.l1_timeout(key):
+                value = self._l1_get(self.make_and_validate_key(key, version))
+            if value is _MISSING:
+                remaining.append(key)
+            else:
+                found[key] = value
+
+        if remaining:
+            for key, value in self.l2.get_many(remaining, version=version).items():
+                self._l1_fill(key, value, version)
+                found[key] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        self._l1_fill(key, value, version, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self._l1_fill(key, value, version, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_discard(self.make_and_validate_key(key, version))
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1_discard(self.make_and_validate_key(key, version))
+        return self.l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        if self.l1_timeout(key) and self._l1_get(self.make_and_validate_key(key, version)) is not _MISSING:
+            return True
+        return self.l2.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._l1_discard(self.make_and_validate_key(key, version))
+        return self.l2.incr(key, delta, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+
+class SQLiteCache(BaseCache):
+    """
+    LOCATION: path of the SQLite file (use a tmpfs path such as /dev/shm for
+    the lowest latency). Honours MAX_ENTRIES and CULL_FREQUENCY like the
+    built-in backends; culling is checked every CULL_CHECK_INTERVAL writes.
+    """
+    CULL_CHECK_INTERVAL = 100
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = str(location)
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')  # Cache contents are disposable
+            conn.execute('PRAGMA temp_store=MEMORY')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL'
+                ') WITHOUT ROWID'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _expiry(self, timeout):
+        # Absolute expiry time, or None to never expire
+        return self.get_backend_timeout(timeout)
+
+    @staticmethod
+    def _encode(value):
+        # Plain ints are stored natively so incr can run in SQL
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _decode(value):
+        return value if isinstance(value, int) else pickle.loads(value)
+
+    def _after_write(self):
+        self._writes += 1
+        if self._max_entries and self._writes % self.CULL_CHECK_INTERVAL == 0:
+            self._cull()
+
+    def _cull(self):
+        conn = self._connection()
+        conn.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            excess = count - self._max_entries
+            cull = max(excess, count // self._cull_frequency if self._cull_frequency else count)
+            # Entries closest to expiry go first; non-expiring entries last
+            conn.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY expires IS NULL, expires LIMIT ?)',
+                (cull,)
+            )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version)
+        row = self._connection().execute(
+            'SELECT value FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone()
+        return default if row is None else self._decode(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version): key for key in keys}
+        if not key_map:
+            return {}
+        rows = self._connection().execute(
+            'SELECT key, value FROM cache WHERE key IN (%s) AND (expires IS NULL OR expires > ?)'
+            % ','.join('?' * len(key_map)),
+            (*key_map, time.time())
+        ).fetchall()
+        return {key_map[key]: self._decode(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)',
+            (key, self._encode(value), self._expiry(timeout))
+        )
+        self._after_write()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        conn = self._connection()
+        # Insert, or take over an expired row; a live row is left untouched
+        cursor = conn.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (key, self._encode(value), self._expiry(timeout), time.time())
+        )
+        self._after_write()
+        return cursor.rowcount > 0
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version)
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expiry(timeout), key, time.time())
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version)
+        cursor = self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version)
+        row = self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time())
+        ).fetchone()
+        return row is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version)
+        conn = self._connection()
+        # The write lock makes the update and read-back one atomic step across processes
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = conn.execute(
+                "UPDATE cache SET value = value + ? WHERE key = ? "
+                "AND typeof(value) = 'integer' AND (expires IS NULL OR expires > ?)",
+                (delta, key, time.time())
+            )
+            if cursor.rowcount == 0:
+                raise ValueError("Key '%s' not found" % key)
+            value = conn.execute('SELECT value FROM cache WHERE key = ?', (key,)).fetchone()[0]
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return value
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Connections are kept open for the life of the thread
+        pass
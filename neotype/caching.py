@@ -0,0 +1,91 @@
+"""
+Stale-while-revalidate caching for hot read endpoints.
+
+``swr_cache_page`` caches a view's response bytes for ``ttl`` seconds and
+keeps serving them for a further ``stale_ttl`` seconds while a single request
+refreshes the entry. The refresh is single-flight across workers: the
+refresher holds a lock taken with the cache backend's atomic ``add``.
+"""
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+
+# Poll interval and limit for requests waiting on another worker's refresh
+LOCK_POLL_INTERVAL = 0.05
+LOCK_WAIT_LIMIT = 2.0
+
+_stats_lock = threading.Lock()
+_stats = Counter()
+
+
+def _record(name, outcome):
+    with _stats_lock:
+        _stats[f'{name}.{outcome}'] += 1
+
+
+def get_cache_stats():
+    """Per-process hit, miss and stale counters keyed '<view>.<outcome>'"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def swr_cache_page(ttl, stale_ttl, key_func=None, lock_timeout=10):
+    """
+    Cache a view's successful responses with stale-while-revalidate.
+
+    `key_func(request, *args, **kwargs)` returns the cache key, or None to
+    bypass the cache for that request. It defaults to the full request path.
+    """
+    def decorator(view_func):
+        name = f'{view_func.__module__}.{view_func.__name__}'
+
+        def refresh(request, key, *args, **kwargs):
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                entry = (time.time() + ttl, response['Content-Type'], response.content)
+                cache.set(key, entry, ttl + stale_ttl)
+            return response
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            key = key_func(request, *args, **kwargs) if key_func else request.get_full_path()
+            if key is None:
+                return view_func(request, *args, **kwargs)
+
+            cache_key = f'swr:{name}:{key}'
+            lock_key = f'{cache_key}:lock'
+            entry = cache.get(cache_key)
+
+            if entry is not None:
+                fresh_until, content_type, content = entry
+                if time.time() < fresh_until:
+                    _record(name, 'hit')
+                    return HttpResponse(content, content_type=content_type)
+
+                # Stale: one request refreshes, the rest get the old bytes
+                _record(name, 'stale')
+                if not cache.add(lock_key, 1, lock_timeout):
+                    return HttpResponse(content, content_type=content_type)
+            else:
+                _record(name, 'miss')
+                if not cache.add(lock_key, 1, lock_timeout):
+                    # Another worker is computing this key; wait briefly for it
+                    deadline = time.monotonic() + LOCK_WAIT_LIMIT
+                    while time.monotonic() < deadline:
+                        time.sleep(LOCK_POLL_INTERVAL)
+                        entry = cache.get(cache_key)
+                        if entry is not None:
+                            return HttpResponse(entry[2], content_type=entry[1])
+                    return view_func(request, *args, **kwargs)
+
+            try:
+                return refresh(request, cache_key, *args, **kwargs)
+            finally:
+                cache.delete(lock_key)
+
+        return wrapper
+    return decorator
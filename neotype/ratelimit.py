@@ -0,0 +1,124 @@
+"""
+Per-route rate limiting.
+
+``RateLimitMiddleware`` applies the first matching rule from
+``settings.RATELIMIT_RULES`` to each request. Requests are counted in fixed
+windows with one atomic cache ``incr`` per request (falling back to ``add``
+when a window starts). Blocking rules answer 429 before the view runs;
+non-blocking rules set ``request.ratelimited`` so the view can respond in
+its own format. Rules with ``failures_only`` leave counting to the view,
+which reports each outcome with ``record_attempt``: failures are counted and
+a success clears the count.
+
+Signed-in users are limited per account and everyone else per address,
+never by anything the client chooses such as a cookie value. Behind
+``RATELIMIT_PROXY_COUNT`` trusted proxies the address is the one the
+outermost proxy appended to ``X-Forwarded-For``; entries further left are
+client-supplied and ignored.
+"""
+import re
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import JsonResponse
+
+PERIOD_SECONDS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+RATE_PATTERN = re.compile(r'^(\d+)/(\d*)([smhd])$')
+
+
+def client_ip(request):
+    """The client's address, read past RATELIMIT_PROXY_COUNT trusted proxies"""
+    hops = getattr(settings, 'RATELIMIT_PROXY_COUNT', 0)
+    if hops:
+        forwarded = [address.strip() for address in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        forwarded = [address for address in forwarded if address]
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def record_attempt(request, succeeded):
+    """Report the outcome of an attempt limited by a ``failures_only`` rule"""
+    rule = getattr(request, 'ratelimit_rule', None)
+    if rule is None or not rule.failures_only:
+        return
+    cache = caches[getattr(settings, 'RATELIMIT_USE_CACHE', 'default')]
+    if succeeded:
+        cache.delete(rule.key(request))
+    else:
+        rule.hit(request, cache)
+
+
+def parse_rate(rate):
+    """Turn '5/15m' into (5, 900)"""
+    match = RATE_PATTERN.match(rate)
+    if not match:
+        raise ValueError(f'Invalid rate: {rate}')
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * PERIOD_SECONDS[unit]
+
+
+class RateLimitRule:
+    def __init__(self, path, rate, methods=None, block=True, per_user=True, failures_only=False):
+        self.path = path
+        self.limit, self.period = parse_rate(rate)
+        self.methods = {method.upper() for method in methods} if methods else None
+        self.block = block
+        self.per_user = per_user
+        self.failures_only = failures_only
+
+    def matches(self, request):
+        return request.path.startswith(self.path) and (self.methods is None or request.method in self.methods)
+
+    def client_id(self, request):
+        # Runs after AuthenticationMiddleware, so request.user is set
+        if self.per_user and request.user.is_authenticated:
+            return f'u{request.user.pk}'
+        return client_ip(request)
+
+    def key(self, request, now=None):
+        window = int((now or time.time()) // self.period)
+        return f'rl:{self.path}:{self.client_id(request)}:{window}'
+
+    def hit(self, request, cache):
+        """Count this request and return (count in window, seconds until the window resets)"""
+        now = time.time()
+        window = int(now // self.period)
+        key = self.key(request, now)
+        try:
+            count = cache.incr(key)
+        except ValueError:
+            # First request of the window (or another worker just created it)
+            count = 1 if cache.add(key, 1, self.period + 1) else cache.incr(key)
+        return count, int((window + 1) * self.period - now) + 1
+
+
+class RateLimitMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.rules = [RateLimitRule(**rule) for rule in getattr(settings, 'RATELIMIT_RULES', [])]
+
+    def __call__(self, request):
+        request.ratelimited = False
+        if getattr(settings, 'RATELIMIT_ENABLE', True):
+            cache = caches[getattr(settings, 'RATELIMIT_USE_CACHE', 'default')]
+            for rule in self.rules:
+                if not rule.matches(request):
+                    continue
+                if rule.failures_only:
+                    # Counted by record_attempt once the view knows the outcome
+                    request.ratelimit_rule = rule
+                    count = (cache.get(rule.key(request)) or 0) + 1
+                    retry_after = rule.period
+                else:
+                    count, retry_after = rule.hit(request, cache)
+                if count > rule.limit:
+                    if rule.block:
+                        response = JsonResponse({'error': 'Too many requests. Please try again later.'}, status=429)
+                        response['Retry-After'] = str(retry_after)
+                        return response
+                    request.ratelimited = True
+                break
+
+        return self.get_response(request)
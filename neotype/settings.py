@@ -35,6 +35,7 @@ INSTALLED_APPS = [
     'typing_test',
     'leaderboard',
     'analytics',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -44,6 +45,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'neotype.ratelimit.RateLimitMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -76,6 +78,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts so concurrent
+            # writers (web workers, run_worker) wait instead of deadlocking
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -140,16 +147,53 @@ LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
 
 # Performance optimizations
+# Node-local cache shared by all gunicorn workers (SQLite file in WAL mode)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'neotype-cache',
+        'BACKEND': 'neotype.cache_backends.SQLiteCache',
+        'LOCATION': os.environ.get('CACHE_LOCATION', BASE_DIR / 'cache.sqlite3'),
         'OPTIONS': {
-            'MAX_ENTRIES': 1000,
+            'MAX_ENTRIES': 10000,
         }
     }
 }
 
+# Typing test sessions: issue signed tokens on start instead of writing a row
+TYPING_SIGNED_SESSIONS = os.environ.get('TYPING_SIGNED_SESSIONS', 'False') == 'True'
+TYPING_SESSION_TOKEN_MAX_AGE = 60 * 60  # 1 hour
+
+# Reject completions that do not include a keystroke log to replay
+TYPING_REQUIRE_KEYSTROKE_LOG = os.environ.get('TYPING_REQUIRE_KEYSTROKE_LOG', 'False') == 'True'
+
+# Write-behind: completions are answered immediately and written by a
+# per-worker flusher thread (falls back to synchronous writes when full)
+TYPING_WRITE_BEHIND = os.environ.get('TYPING_WRITE_BEHIND', 'False') == 'True'
+TYPING_WRITE_BEHIND_MAX_ITEMS = 1000
+TYPING_WRITE_BEHIND_FLUSH_MS = 200
+TYPING_WRITE_BEHIND_BATCH = 100
+
+# Deferred follow-ups: stats and leaderboard updates for completed tests are
+# queued for `manage.py run_worker` instead of running in the request
+TYPING_DEFERRED_FOLLOWUPS = os.environ.get('TYPING_DEFERRED_FOLLOWUPS', 'False') == 'True'
+
+# Anti-cheat: completions with a keystroke log are scored by the
+# typing_test.analyze_sessions job; flagged sessions leave the leaderboards
+TYPING_ANTICHEAT = os.environ.get('TYPING_ANTICHEAT', 'False') == 'True'
+
+# Rate limiting: first matching rule wins. Non-blocking rules flag the request
+# (request.ratelimited) and the view responds in its own format.
+RATELIMIT_ENABLE = os.environ.get('RATELIMIT_ENABLE', 'True') == 'True'
+RATELIMIT_USE_CACHE = 'default'
+# Reverse proxies in front of the app that append to X-Forwarded-For
+RATELIMIT_PROXY_COUNT = int(os.environ.get('RATELIMIT_PROXY_COUNT', '0'))
+RATELIMIT_RULES = [
+    {'path': '/accounts/signup/', 'methods': ['POST'], 'rate': '3/h', 'block': False, 'per_user': False, 'failures_only': True},
+    {'path': '/accounts/login/', 'methods': ['POST'], 'rate': '5/15m', 'block': False, 'per_user': False, 'failures_only': True},
+    {'path': '/typing/api/', 'rate': '120/m'},
+    {'path': '/leaderboard/api/', 'rate': '120/m'},
+    {'path': '/api/batch-update/', 'rate': '30/m'},
+]
+
 # Session configuration
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_AGE = 86400  # 24 hours
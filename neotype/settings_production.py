@@ -62,12 +62,22 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-# Cache configuration (using database cache)
+# Cache configuration: per-process LRU in front of the shared database cache
 CACHES = {
     'default': {
+        'BACKEND': 'neotype.cache_backends.TwoTierCache',
+        'OPTIONS': {
+            'L2_ALIAS': 'shared',
+            'L1_MAX_ENTRIES': 2000,
+            'L1_PREFIXES': {
+                'swr:': 30,  # Rendered pages, immutable per leaderboard version
+            },
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'cache_table',
-    }
+    },
 }
 
 # Email configuration (configure based on your email service)
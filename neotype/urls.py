@@ -25,6 +25,7 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path('typing/', include('typing_test.urls')),
     path('leaderboard/', include('leaderboard.urls')),
+    path('api/batch-update/', typing_views.batch_upload_sessions, name='batch_update'),
     path('', typing_views.home_view, name='home'),  # Home page with typing test
 ]
 
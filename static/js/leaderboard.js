@@ -4,6 +4,7 @@ class Leaderboard {
         this.userId = options.userId;
         this.isAuthenticated = options.isAuthenticated;
         this.currentCategory = 'wpm';
+        this.currentDuration = options.duration || 30;
         this.currentPeriod = 'all';
         this.currentPage = 1;
         this.pageSize = 20;
@@ -252,7 +253,7 @@ class Leaderboard {
     async loadUserRank() {
         if (!this.isAuthenticated) return;
         
-        const cacheKey = `user_rank_${this.currentCategory}_${this.currentPeriod}`;
+        const cacheKey = `user_rank_${this.currentDuration}_${this.currentPeriod}`;
         const cachedData = this.getFromCache(cacheKey);
         
         if (cachedData) {
@@ -261,7 +262,7 @@ class Leaderboard {
         }
         
         try {
-            const response = await fetch(`/api/user-rank/?category=${this.currentCategory}&period=${this.currentPeriod}`);
+            const response = await fetch(`/leaderboard/api/user-rank/?duration=${this.currentDuration}&period=${this.currentPeriod}`);
             
             if (!response.ok) {
                 throw new Error('Failed to fetch user rank');
@@ -305,6 +305,8 @@ class CostOptimizedTypingEngine {
             
             this.currentTest = {
                 text: textData.text,
+                textId: textData.text_id,
+                promptRef: textData.prompt_ref,
                 wordCount: textData.word_count,
                 characterCount: textData.character_count
             };
@@ -312,6 +314,7 @@ class CostOptimizedTypingEngine {
             // Start session on server
             const sessionData = await this.startServerSession();
             this.currentTest.sessionId = sessionData.session_id;
+            this.currentTest.sessionToken = sessionData.session_token;
             
             // Initialize display
             this.updateDisplay();
@@ -351,9 +354,12 @@ class CostOptimizedTypingEngine {
                 'Content-Type': 'application/json',
                 'X-CSRFToken': window.csrfToken || ''
             },
+            // Generated prompts are sent as their reference instead of the text
             body: JSON.stringify({
                 duration: this.duration,
-                text_content: this.currentTest.text
+                text_content: this.currentTest.promptRef ? undefined : this.currentTest.text,
+                text_id: this.currentTest.textId,
+                prompt_ref: this.currentTest.promptRef
             })
         });
         
@@ -417,10 +423,12 @@ class CostOptimizedTypingEngine {
             },
             body: JSON.stringify({
                 session_id: this.currentTest.sessionId,
+                session_token: this.currentTest.sessionToken,
                 typed_text: this.typedText,
                 actual_time: actualTime,
                 focus_lost_count: this.focusLostCount,
-                suspicious_events: this.suspiciousEvents
+                suspicious_events: this.suspiciousEvents,
+                keystroke_log: this.encodeKeystrokeLog()
             })
         });
         
@@ -431,6 +439,50 @@ class CostOptimizedTypingEngine {
         return await response.json();
     }
     
+    // Pack keystrokes into the binary log format (see typing_test/keystrokes.py):
+    // b'KL', version, count, then columns of time deltas, key codes and hold times
+    encodeKeystrokeLog() {
+        const count = this.keystrokes.length;
+        const deltas = [];
+        const keys = [];
+        const holds = [];
+        let previous = 0;
+        
+        for (const keystroke of this.keystrokes) {
+            const time = Math.max(previous, Math.round(keystroke.timestamp - this.startTime));
+            deltas.push(time - previous);
+            keys.push(keystroke.key === 'Backspace' ? 8 : keystroke.key.codePointAt(0));
+            holds.push(Math.min(Math.round(keystroke.duration || 0), 0xFFFFFFFF));
+            previous = time;
+        }
+        
+        const columns = [deltas, keys, holds].map(values => {
+            const largest = values.reduce((a, b) => Math.max(a, b), 0);
+            const width = largest < 0x100 ? 1 : largest < 0x10000 ? 2 : 4;
+            const bytes = new Uint8Array(1 + values.length * width);
+            const view = new DataView(bytes.buffer);
+            bytes[0] = width;
+            values.forEach((value, i) => {
+                if (width === 1) view.setUint8(1 + i, value);
+                else if (width === 2) view.setUint16(1 + i * 2, value, true);
+                else view.setUint32(1 + i * 4, value, true);
+            });
+            return bytes;
+        });
+        
+        const header = new Uint8Array(7);
+        header.set([0x4B, 0x4C, 1]);
+        new DataView(header.buffer).setUint32(3, count, true);
+        
+        let binary = '';
+        for (const part of [header, ...columns]) {
+            for (let i = 0; i < part.length; i += 0x8000) {
+                binary += String.fromCharCode.apply(null, part.subarray(i, i + 0x8000));
+            }
+        }
+        return btoa(binary);
+    }
+    
     calculateLocalResults(actualTime) {
         const wpm = this.calculateWPM(actualTime);
         const accuracy = this.calculateAccuracy();
@@ -577,8 +629,10 @@ class CostOptimizedTypingEngine {
     // Batch updates to minimize server load
     queueForBatchUpload(data) {
         this.batchUpdates.push({
-            timestamp: Date.now(),
-            data: data
+            ...data,
+            // Lets the server drop results it already stored on a retry
+            idempotency_key: data.idempotency_key || `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`,
+            completed_at: data.completed_at || Date.now()
         });
         
         // Upload batch every 10 sessions or 5 minutes
@@ -592,18 +646,21 @@ class CostOptimizedTypingEngine {
     async uploadBatchToServer() {
         if (this.batchUpdates.length === 0) return;
         
+        const batch = this.batchUpdates.slice(0, 50);
         try {
             const response = await fetch('/api/batch-update/', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
+                headers: {
+                    'Content-Type': 'application/json',
+                    'X-CSRFToken': window.csrfToken || ''
+                },
                 body: JSON.stringify({
-                    sessions: this.batchUpdates,
-                    compressed: true
+                    sessions: batch
                 })
             });
             
             if (response.ok) {
-                this.batchUpdates = [];
+                this.batchUpdates = this.batchUpdates.slice(batch.length);
                 this.lastServerSync = Date.now();
             }
         } catch (error) {
@@ -0,0 +1,81 @@
+"""
+Keystroke-timing plausibility scoring.
+
+``timing_features`` summarises a decoded keystroke log's inter-key
+intervals; ``plausibility_score`` turns the features into a 0-100 score
+where low values look scripted: near-constant intervals (low variation or
+one dominant interval), sustained bursts faster than a person can type, and
+identical key hold times. Sessions scoring below ``FLAG_THRESHOLD`` are
+flagged and kept off the leaderboards. Scoring runs off the request path as
+the ``typing_test.analyze_sessions`` job.
+"""
+import statistics
+from collections import Counter, namedtuple
+
+# Logs shorter than this are not scored
+MIN_INTERVALS = 20
+# Intervals under this many ms count as a burst
+BURST_MS = 25
+# Intervals within this many ms of the median count as the dominant interval
+MODE_WINDOW_MS = 2
+# Sustained keys per second beyond human range
+MAX_KEYS_PER_SECOND = 25
+
+FLAG_THRESHOLD = 50
+
+TimingFeatures = namedtuple('TimingFeatures', [
+    'intervals', 'mean', 'cv', 'burst_ratio', 'zero_ratio', 'mode_share', 'hold_share', 'keys_per_second',
+])
+
+
+def timing_features(keystrokes):
+    """Interval statistics for a decoded log, or None if it is too short to judge"""
+    times = keystrokes.times
+    intervals = [later - earlier for earlier, later in zip(times, times[1:])]
+    count = len(intervals)
+    if count < MIN_INTERVALS:
+        return None
+
+    mean = statistics.fmean(intervals)
+    median = statistics.median(intervals)
+    holds = [hold for hold in keystrokes.holds if hold]
+    hold_share = Counter(holds).most_common(1)[0][1] / len(holds) if len(holds) >= MIN_INTERVALS else 0.0
+    elapsed = (times[-1] - times[0]) / 1000
+
+    return TimingFeatures(
+        intervals=count,
+        mean=mean,
+        cv=statistics.pstdev(intervals, mean) / mean if mean else 0.0,
+        burst_ratio=sum(interval < BURST_MS for interval in intervals) / count,
+        zero_ratio=intervals.count(0) / count,
+        mode_share=sum(abs(interval - median) <= MODE_WINDOW_MS for interval in intervals) / count,
+        hold_share=hold_share,
+        keys_per_second=count / elapsed if elapsed else float('inf'),
+    )
+
+
+def plausibility_score(features, focus_lost_count=0):
+    """0 (scripted) to 100 (human-like); None when there is too little to judge"""
+    if features is None:
+        return None
+
+    score = 100.0
+    if features.cv < 0.15:
+        score -= 40
+    elif features.cv < 0.25:
+        score -= 20
+    if features.mode_share > 0.6:
+        score -= 30
+    if features.burst_ratio > 0.3:
+        score -= 30
+    elif features.burst_ratio > 0.15:
+        score -= 15
+    if features.zero_ratio > 0.1:
+        score -= 20
+    if features.hold_share > 0.8:
+        score -= 10
+    if features.keys_per_second > MAX_KEYS_PER_SECOND:
+        score -= 30
+    if focus_lost_count > 3:
+        score -= 10
+    return max(0.0, score)
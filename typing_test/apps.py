@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TypingTestConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'typing_test'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,173 @@
+"""
+Batched upload of results recorded while a client was offline.
+
+``ingest_batch`` validates a list of results, stores the new ones with one
+``bulk_create`` and folds them into ``UserStats`` and the leaderboards once
+per batch. Each result carries a client-generated idempotency key, so a batch
+that is retried after a lost response is not stored twice. Results pass the
+same keystroke-log checks as a single completion (``verify_completion``).
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from leaderboard.board_cache import invalidate_boards
+from leaderboard.jobs import enqueue_rerank
+from leaderboard.models import LeaderboardEntry
+from leaderboard.ranks import rank_service
+
+from .completion import CompletionError, store_keystroke_logs, verify_completion
+from .generator import canonical_prompt_ref, generate_text
+from .models import SessionText, TestSession, UserStats
+
+MAX_BATCH_SIZE = 50
+MAX_RESULT_AGE = timedelta(days=7)
+MAX_CLOCK_SKEW = timedelta(minutes=5)
+MAX_WPM = 300
+
+
+class BatchItemError(ValueError):
+    """Raised for a result that cannot be stored"""
+
+
+def build_session(user, item, now):
+    """Validate one uploaded result and return an unsaved completed TestSession"""
+    from .views import calculate_typing_metrics
+
+    if not isinstance(item, dict):
+        raise BatchItemError('Result must be an object')
+
+    key = item.get('idempotency_key')
+    if not isinstance(key, str) or not 0 < len(key) <= 64:
+        raise BatchItemError('idempotency_key required')
+
+    try:
+        duration = int(item.get('duration'))
+        actual_time = float(item.get('actual_time', 0))
+        focus_lost_count = max(0, int(item.get('focus_lost_count', 0)))
+        completed_ms = item.get('completed_at')
+        completed_at = now if completed_ms is None else datetime.fromtimestamp(
+            int(completed_ms) / 1000, tz=dt_timezone.utc
+        )
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise BatchItemError('Invalid numeric field')
+
+    text_content = item.get('text_content')
+    typed_text = item.get('typed_text')
+    prompt_ref = item.get('prompt_ref')
+    if prompt_ref:
+        try:
+            prompt_ref = canonical_prompt_ref(prompt_ref)
+            text_content = generate_text(prompt_ref)
+        except ValueError:
+            raise BatchItemError('Invalid prompt_ref')
+    if duration not in dict(TestSession.DURATION_CHOICES):
+        raise BatchItemError('Invalid duration')
+    if not isinstance(text_content, str) or not text_content or not isinstance(typed_text, str):
+        raise BatchItemError('text_content and typed_text required')
+    if not 0 < actual_time <= duration + 5:
+        raise BatchItemError('Invalid actual_time')
+    if not now - MAX_RESULT_AGE <= completed_at <= now + MAX_CLOCK_SKEW:
+        raise BatchItemError('completed_at out of range')
+    try:
+        typed_text, actual_time, keystroke_log = verify_completion(
+            item.get('keystroke_log'), text_content, duration, typed_text, actual_time
+        )
+    except CompletionError as e:
+        raise BatchItemError(str(e))
+
+    metrics = calculate_typing_metrics(text_content, typed_text, actual_time)
+    if metrics['wpm'] > MAX_WPM:
+        raise BatchItemError('Implausible WPM')
+
+    completed_at = min(completed_at, now)
+    suspicious_events = item.get('suspicious_events', [])
+    session = TestSession(
+        user=user,
+        duration=duration,
+        text_content='' if prompt_ref else text_content,
+        prompt_ref=prompt_ref or None,
+        typed_text=typed_text,
+        wpm=metrics['wpm'],
+        accuracy=metrics['accuracy'],
+        # bulk_create bypasses save(), so the score is set here
+        composite_score=TestSession.calculate_composite_score(metrics['wpm'], metrics['accuracy']),
+        typing_time=actual_time,
+        correct_chars=metrics['correct_chars'],
+        incorrect_chars=metrics['incorrect_chars'],
+        extra_chars=metrics['extra_chars'],
+        missed_chars=metrics['missed_chars'],
+        total_chars=metrics['total_chars'],
+        focus_lost_count=focus_lost_count,
+        suspicious_events=suspicious_events if isinstance(suspicious_events, list) else [],
+        completed=True,
+        started_at=completed_at - timedelta(seconds=actual_time),
+        completed_at=completed_at,
+        idempotency_key=key,
+    )
+    session.pending_keystroke_log = keystroke_log
+    return session
+
+
+def ingest_batch(user, items):
+    """
+    Store a batch of results for `user`.
+
+    Returns ``(created sessions, duplicate keys, rejected)`` where rejected is
+    a list of ``{'index', 'error'}``.
+    """
+    now = timezone.now()
+    candidates = {}
+    rejected = []
+    for index, item in enumerate(items):
+        try:
+            session = build_session(user, item, now)
+        except BatchItemError as e:
+            rejected.append({'index': index, 'error': str(e)})
+            continue
+        # Repeats within the batch keep the first occurrence
+        candidates.setdefault(session.idempotency_key, session)
+
+    # Prompts are stored once in SessionText rather than copied into each row
+    inline = [s for s in candidates.values() if not s.prompt_ref]
+    text_ids = SessionText.intern_many([s.text_content for s in inline])
+    for session in inline:
+        session.text_id = text_ids[session.text_content]
+        session.text_content = ''
+
+    for attempt in range(2):
+        existing = set(TestSession.objects.filter(
+            user=user, idempotency_key__in=list(candidates)
+        ).values_list('idempotency_key', flat=True))
+        new_sessions = [s for key, s in candidates.items() if key not in existing]
+        try:
+            with transaction.atomic():
+                created = TestSession.objects.bulk_create(new_sessions)
+                if created:
+                    store_keystroke_logs(created)
+                    UserStats.record_sessions(user.id, created)
+            break
+        except IntegrityError:
+            # A concurrent retry of the same batch stored some keys first
+            if attempt:
+                raise
+
+    return created, sorted(existing), rejected
+
+
+def update_boards(sessions):
+    """
+    Fold stored completed sessions into the leaderboards, once per board,
+    and queue a re-rank of the boards that changed. Returns {duration:
+    periods whose entry changed}.
+    """
+    changed = LeaderboardEntry.record_sessions(sessions)
+    for session in sessions:
+        rank_service.record_session(session)
+    for duration, periods in changed.items():
+        best_score = max(s.composite_score for s in sessions if s.duration == duration)
+        invalidate_boards(duration, periods, best_score)
+        for period in periods:
+            enqueue_rerank(duration, period)
+    return changed
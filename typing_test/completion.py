@@ -0,0 +1,58 @@
+"""
+Checks shared by every way a test session is completed.
+
+A result arrives through ``complete_test_session``, the offline batch upload
+or (after the view) the write-behind buffer. ``verify_completion`` applies
+the keystroke-log rules to each of them: when ``TYPING_REQUIRE_KEYSTROKE_LOG``
+is set a log is required, and any log sent is replayed so the session is
+scored from what it proves was typed. ``store_keystroke_logs`` saves the logs
+of stored sessions and queues their anti-cheat analysis.
+"""
+from django.conf import settings
+
+from jobs.queue import enqueue
+
+from .keystrokes import KeystrokeLogError, decode_base64_log
+from .models import KeystrokeLog
+from .replay import ReplayMismatch, verify_result
+
+
+class CompletionError(ValueError):
+    """Raised for a completion that must be rejected"""
+
+
+def verify_completion(encoded_log, prompt, duration, typed_text, actual_time):
+    """
+    Check a completion against its base64 keystroke log.
+
+    Returns ``(typed_text, typing_time, keystroke_log)`` to score and store
+    the session with; ``keystroke_log`` is an unsaved KeystrokeLog, or None
+    if no log was sent and none is required.
+    """
+    if not encoded_log:
+        if settings.TYPING_REQUIRE_KEYSTROKE_LOG:
+            raise CompletionError('Keystroke log required')
+        return typed_text, actual_time, None
+
+    try:
+        log_data, keystrokes = decode_base64_log(encoded_log)
+        typed_text, actual_time = verify_result(keystrokes, prompt, duration, typed_text, actual_time)
+    except (KeystrokeLogError, ReplayMismatch) as e:
+        raise CompletionError(str(e))
+    return typed_text, actual_time, KeystrokeLog(version=log_data[2], event_count=len(keystrokes.keys), data=log_data)
+
+
+def store_keystroke_logs(sessions):
+    """Save the pending keystroke logs of stored sessions and queue their anti-cheat analysis"""
+    logs = []
+    for session in sessions:
+        log = getattr(session, 'pending_keystroke_log', None)
+        if log is not None:
+            log.session = session
+            logs.append(log)
+    if not logs:
+        return
+    KeystrokeLog.objects.bulk_create(logs, ignore_conflicts=True)
+    if settings.TYPING_ANTICHEAT:
+        for log in logs:
+            enqueue('typing_test.analyze_sessions', {'session_id': log.session.id})
@@ -0,0 +1,101 @@
+"""
+Per-process index of active typing texts.
+
+Replaces ``ORDER BY RANDOM()`` in the text endpoint: active texts are loaded
+once, pre-tokenized and grouped by (language, difficulty, category) so a text
+can be picked in O(1). A generation counter in the shared cache tells every
+worker when ``TextContent`` rows have changed and the index must be rebuilt.
+"""
+import random
+import threading
+import time
+from collections import namedtuple
+
+from django.core.cache import cache
+
+from .models import TextContent
+
+GENERATION_CACHE_KEY = 'typing_test:corpus_generation'
+
+# How often (seconds) a worker compares its index against the shared generation
+GENERATION_CHECK_INTERVAL = 30
+
+CorpusEntry = namedtuple('CorpusEntry', ['id', 'words'])
+
+
+def get_corpus_generation():
+    """Return the shared corpus generation, seeding it if the cache lost it"""
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        # Seed with a timestamp so a lost key never matches a stale index
+        cache.add(GENERATION_CACHE_KEY, int(time.time() * 1000), None)
+        generation = cache.get(GENERATION_CACHE_KEY)
+    return generation
+
+
+def bump_corpus_generation():
+    """Mark every worker's corpus index as stale"""
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.add(GENERATION_CACHE_KEY, int(time.time() * 1000), None)
+    corpus_index.invalidate()
+
+
+class TextCorpusIndex:
+    """Active text ids and word arrays grouped by (language, difficulty, category)
+
+    The same mapping also holds each entry under its bare text id.
+    """
+
+    def __init__(self, check_interval=GENERATION_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._buckets = None
+        self._generation = None
+        self._checked_at = 0.0
+
+    def pick(self, difficulty, language='en', category=None):
+        """Return a random CorpusEntry, or None if nothing matches"""
+        entries = self._get_buckets().get((language, difficulty, category))
+        if not entries:
+            return None
+        return random.choice(entries)
+
+    def get(self, text_id):
+        """Return the CorpusEntry for an active text id, or None"""
+        return self._get_buckets().get(text_id)
+
+    def invalidate(self):
+        """Force a rebuild on the next lookup in this process"""
+        self._buckets = None
+
+    def _get_buckets(self):
+        buckets = self._buckets
+        if buckets is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return buckets
+
+        with self._lock:
+            generation = get_corpus_generation()
+            if self._buckets is None or generation != self._generation:
+                self._buckets = self._build()
+                self._generation = generation
+            self._checked_at = time.monotonic()
+            return self._buckets
+
+    @staticmethod
+    def _build():
+        buckets = {}
+        rows = TextContent.objects.filter(is_active=True).values_list(
+            'id', 'language', 'difficulty', 'category', 'content'
+        )
+        for text_id, language, difficulty, category, content in rows:
+            entry = CorpusEntry(text_id, tuple(content.split()))
+            # Category-specific bucket plus an "any category" bucket
+            buckets.setdefault((language, difficulty, category), []).append(entry)
+            buckets.setdefault((language, difficulty, None), []).append(entry)
+            buckets[text_id] = entry
+        return buckets
+
+
+corpus_index = TextCorpusIndex()
@@ -0,0 +1,88 @@
+"""
+Deterministic generated prompts.
+
+A generated prompt is fully described by a short reference string,
+``g<version>:<difficulty>:<word count>:<seed>``, so sessions, tokens and
+clients carry the reference instead of the text and the server regenerates
+it on demand. Word lists are versioned: a published version must never be
+edited, add a new one instead. Words are drawn with SplitMix64 rather than
+the ``random`` module so a reference yields the same text on every Python
+version, which keeps old results re-scorable. References from clients are
+parsed strictly and stored in the canonical form ``make_prompt_ref`` writes.
+"""
+import re
+import secrets
+from collections import namedtuple
+from functools import lru_cache
+
+WORD_LISTS = {
+    1: {
+        'easy': ['the', 'and', 'for', 'you', 'are', 'with', 'this', 'that', 'have', 'from',
+                 'they', 'know', 'want', 'been', 'good', 'much', 'some', 'time', 'very', 'when'],
+        'medium': ['people', 'about', 'would', 'could', 'there', 'their', 'think', 'where', 'being', 'right',
+                   'before', 'after', 'should', 'through', 'during', 'follow', 'around', 'between', 'without',
+                   'something'],
+        'hard': ['government', 'development', 'management', 'information', 'environment', 'community',
+                 'university', 'technology', 'opportunity', 'experience', 'achievement', 'responsibility',
+                 'understanding', 'communication', 'organization', 'relationship', 'professional',
+                 'international', 'contemporary', 'perspective'],
+    },
+}
+CURRENT_VERSION = 1
+MAX_WORDS = 500
+
+_MASK64 = (1 << 64) - 1
+
+# Plain ASCII integers without signs, underscores or leading zeros
+_REF_PATTERN = re.compile(r'g(0|[1-9][0-9]*):([a-z]+):(0|[1-9][0-9]*):(0|[1-9][0-9]*)')
+
+PromptSpec = namedtuple('PromptSpec', ['version', 'difficulty', 'word_count', 'seed'])
+
+
+def make_prompt_ref(difficulty, word_count, seed=None, version=CURRENT_VERSION):
+    """Build a reference for a prompt, with a fresh random seed by default"""
+    if seed is None:
+        seed = secrets.randbits(32)
+    return f'g{version}:{difficulty}:{word_count}:{seed}'
+
+
+def parse_prompt_ref(ref):
+    """Split and validate a reference; raises ValueError if it is unusable"""
+    match = _REF_PATTERN.fullmatch(ref) if isinstance(ref, str) else None
+    if match is None:
+        raise ValueError(f'Invalid prompt reference: {ref!r}')
+    version, difficulty, word_count, seed = match.groups()
+    spec = PromptSpec(int(version), difficulty, int(word_count), int(seed))
+    if difficulty not in WORD_LISTS.get(spec.version, {}):
+        raise ValueError(f'Unknown prompt word list: {ref!r}')
+    if not 0 < spec.word_count <= MAX_WORDS or not 0 <= spec.seed <= _MASK64:
+        raise ValueError(f'Prompt reference out of range: {ref!r}')
+    return spec
+
+
+def canonical_prompt_ref(ref):
+    """Validate a client's reference and return it as ``make_prompt_ref`` writes it"""
+    spec = parse_prompt_ref(ref)
+    return make_prompt_ref(spec.difficulty, spec.word_count, spec.seed, spec.version)
+
+
+def _splitmix64(seed):
+    state = seed
+    while True:
+        state = (state + 0x9E3779B97F4A7C15) & _MASK64
+        z = state
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+        yield z ^ (z >> 31)
+
+
+def generate_text(ref):
+    """Regenerate the prompt for a reference; raises ValueError if it is unusable"""
+    return _generate(parse_prompt_ref(ref))
+
+
+@lru_cache(maxsize=1024)
+def _generate(spec):
+    words = WORD_LISTS[spec.version][spec.difficulty]
+    stream = _splitmix64(spec.seed)
+    return ' '.join(words[next(stream) % len(words)] for _ in range(spec.word_count))
@@ -0,0 +1,52 @@
+"""Background job handlers for typing tests (run by `manage.py run_worker`)"""
+from jobs.queue import register
+from leaderboard.board_cache import bump_board_version
+from leaderboard.jobs import enqueue_rerank
+from leaderboard.models import LeaderboardEntry
+
+from .anticheat import FLAG_THRESHOLD, plausibility_score, timing_features
+from .batch import update_boards
+from .models import KeystrokeLog, TestSession, UserStats
+
+
+@register('typing_test.record_sessions', batch=True)
+def record_sessions(payloads):
+    """Fold completed sessions into stats and leaderboards, once per user and board"""
+    sessions = list(TestSession.objects.filter(
+        id__in=[payload['session_id'] for payload in payloads],
+        completed=True,
+        user__isnull=False,
+    ))
+
+    by_user = {}
+    for session in sessions:
+        by_user.setdefault(session.user_id, []).append(session)
+    for user_id, user_sessions in by_user.items():
+        UserStats.record_sessions(user_id, user_sessions)
+
+    update_boards(sessions)
+
+
+@register('typing_test.analyze_sessions', batch=True)
+def analyze_sessions(payloads):
+    """Score keystroke timing and withdraw flagged sessions from the leaderboards"""
+    sessions = list(TestSession.objects.filter(
+        id__in=[payload['session_id'] for payload in payloads],
+        completed=True,
+    ).only('id', 'user_id', 'duration', 'focus_lost_count', 'flagged'))
+    logs = KeystrokeLog.objects.in_bulk([session.id for session in sessions])
+
+    newly_flagged = []
+    for session in sessions:
+        log = logs.get(session.id)
+        features = timing_features(log.decode()) if log else None
+        session.plausibility = plausibility_score(features, session.focus_lost_count)
+        flagged = session.plausibility is not None and session.plausibility < FLAG_THRESHOLD
+        if flagged and not session.flagged:
+            newly_flagged.append(session)
+        session.flagged = flagged
+    TestSession.objects.bulk_update(sessions, ['plausibility', 'flagged'])
+
+    for duration, period in LeaderboardEntry.withdraw_sessions(newly_flagged):
+        bump_board_version(duration, period)
+        enqueue_rerank(duration, period)
@@ -0,0 +1,111 @@
+"""
+Compact binary keystroke logs.
+
+Format (version 1), all integers little-endian and unsigned::
+
+    b'KL'  version:u8  count:u32
+    3 columns, each: width:u8 (1, 2 or 4) followed by count * width bytes
+      1. milliseconds since the previous keystroke (the first is since start)
+      2. key code point, any Unicode scalar value (8 = Backspace)
+      3. key hold time in milliseconds (0 = not measured)
+
+Each column uses the narrowest width that fits all of its values, so a
+typical 60 second test is about 4 bytes per keystroke against ~90 for the
+client's JSON objects. Decoding is a handful of C-level ``array`` copies;
+the arrays expose the buffer protocol, so NumPy can wrap them without
+copying: ``numpy.frombuffer(log.times, dtype=log.times.typecode)``.
+"""
+import base64
+import binascii
+import sys
+from array import array
+from collections import namedtuple
+from itertools import accumulate
+
+MAGIC = b'KL'
+VERSION = 1
+HEADER_SIZE = 7
+KEY_BACKSPACE = 8
+
+# Upper bounds for a single test's log (base64 form: widest columns)
+MAX_EVENTS = 10000
+MAX_ENCODED_SIZE = (HEADER_SIZE + 3 + MAX_EVENTS * 12) * 4 // 3 + 4
+
+WIDTH_TYPECODES = {1: 'B', 2: 'H', 4: 'I'}
+
+Keystrokes = namedtuple('Keystrokes', ['times', 'keys', 'holds'])
+Keystrokes.__doc__ = 'Decoded log: cumulative times (ms), key code points and hold times (ms)'
+
+
+class KeystrokeLogError(ValueError):
+    """Raised for a log that is malformed or too large"""
+
+
+def _column(values):
+    largest = max(values, default=0)
+    for width, typecode in WIDTH_TYPECODES.items():
+        if largest < 1 << (8 * width):
+            column = array(typecode, values)
+            if sys.byteorder == 'big':
+                column.byteswap()
+            return bytes([width]) + column.tobytes()
+    raise KeystrokeLogError('Value too large for a keystroke log')
+
+
+def encode_log(times, keys, holds):
+    """Encode cumulative times (ms), key code points and hold times (ms)"""
+    if not len(times) == len(keys) == len(holds):
+        raise KeystrokeLogError('Columns must have the same length')
+    deltas = [later - earlier for earlier, later in zip([0, *times], times)]
+    if any(delta < 0 for delta in deltas):
+        raise KeystrokeLogError('Times must not decrease')
+    return b''.join([
+        MAGIC, bytes([VERSION]), len(times).to_bytes(4, 'little'),
+        _column(deltas), _column(keys), _column(holds),
+    ])
+
+
+def decode_log(data):
+    """Decode a binary log into a Keystrokes tuple of arrays"""
+    if len(data) < HEADER_SIZE or data[:2] != MAGIC:
+        raise KeystrokeLogError('Not a keystroke log')
+    if data[2] != VERSION:
+        raise KeystrokeLogError(f'Unsupported keystroke log version {data[2]}')
+    count = int.from_bytes(data[3:HEADER_SIZE], 'little')
+    if count > MAX_EVENTS:
+        raise KeystrokeLogError('Keystroke log too long')
+
+    columns = []
+    offset = HEADER_SIZE
+    for _ in range(3):
+        typecode = WIDTH_TYPECODES.get(data[offset]) if offset < len(data) else None
+        if typecode is None:
+            raise KeystrokeLogError('Invalid column width')
+        end = offset + 1 + count * data[offset]
+        if end > len(data):
+            raise KeystrokeLogError('Truncated keystroke log')
+        column = array(typecode)
+        column.frombytes(data[offset + 1:end])
+        if sys.byteorder == 'big':
+            column.byteswap()
+        columns.append(column)
+        offset = end
+    if offset != len(data):
+        raise KeystrokeLogError('Trailing bytes after keystroke log')
+
+    deltas, keys, holds = columns
+    # Every key must be a character str and UTF-8 can hold: no surrogates, nothing past U+10FFFF
+    if keys.typecode != 'B' and any(0xD800 <= key <= 0xDFFF or key > 0x10FFFF for key in keys):
+        raise KeystrokeLogError('Invalid key code in keystroke log')
+    return Keystrokes(array('q', accumulate(deltas)), keys, holds)
+
+
+def decode_base64_log(encoded):
+    """Decode the base64 text form sent by the typing engine; returns (raw bytes, Keystrokes)"""
+    if not isinstance(encoded, str) or len(encoded) > MAX_ENCODED_SIZE:
+        raise KeystrokeLogError('Invalid keystroke log')
+    try:
+        data = base64.b64decode(encoded, validate=True)
+    except (binascii.Error, ValueError):
+        raise KeystrokeLogError('Invalid keystroke log encoding')
+    return data, decode_log(data)
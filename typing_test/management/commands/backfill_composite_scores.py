@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from typing_test.models import TestSession
+
+
+class Command(BaseCommand):
+    help = 'Fill TestSession.composite_score for completed sessions in id-ordered chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Number of sessions updated per batch (default: 2000)'
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Recompute every completed session, not only those still at 0'
+        )
+
+    def handle(self, *args, **options):
+        sessions = TestSession.objects.filter(completed=True)
+        if not options['all']:
+            sessions = sessions.filter(composite_score=0)
+
+        last_id = 0
+        updated = 0
+        while True:
+            chunk = list(
+                sessions.filter(id__gt=last_id).order_by('id').only('id', 'wpm', 'accuracy')[:options['chunk_size']]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            for session in chunk:
+                session.composite_score = TestSession.calculate_composite_score(session.wpm, session.accuracy)
+            TestSession.objects.bulk_update(chunk, ['composite_score'])
+            updated += len(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Updated composite scores for {updated} sessions'))
@@ -0,0 +1,328 @@
+import bisect
+import io
+import math
+import random
+import secrets
+import time
+from collections import namedtuple
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from accounts.models import User
+from typing_test.generator import generate_text, make_prompt_ref
+from typing_test.models import TestSession, UserStats
+from typing_test.management.commands.reconcile_user_stats import Command as ReconcileCommand
+
+# Share of sessions per test duration
+DURATION_MIX = {15: 0.2, 30: 0.5, 60: 0.3}
+# Short tests are typed a little faster, long ones a little slower
+DURATION_PACE = {15: 1.05, 30: 1.0, 60: 0.97}
+DIFFICULTY_MIX = {'easy': 0.3, 'medium': 0.5, 'hard': 0.2}
+# Distinct seeded prompts per difficulty and duration (stays inside generate_text's cache)
+PROMPTS_PER_KIND = 100
+
+
+def index_definitions(table):
+    """(name, CREATE INDEX statement) of a table's secondary indexes, for the backends that expose them"""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            # Indexes backing UNIQUE columns have no SQL and are left alone
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = %s AND sql IS NOT NULL",
+                [table],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN '
+                '(SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)',
+                [table, table],
+            )
+        else:
+            return None
+        return cursor.fetchall()
+
+
+@contextmanager
+def deferred_indexes(model, stdout):
+    """Drop a table's secondary indexes for the duration of a bulk load and rebuild them afterwards"""
+    table = model._meta.db_table
+    definitions = index_definitions(table)
+    if definitions is None:
+        stdout.write(f'Index deferral is not supported on {connection.vendor}; loading with indexes in place')
+        yield
+        return
+
+    with connection.cursor() as cursor:
+        for name, _ in definitions:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield
+    finally:
+        start = time.monotonic()
+        with connection.cursor() as cursor:
+            for _, sql in definitions:
+                cursor.execute(sql)
+        stdout.write(f'Rebuilt {len(definitions)} indexes on {table} in {time.monotonic() - start:.1f}s')
+
+
+# Columns generated per session; every other column takes its default
+SessionRow = namedtuple('SessionRow', [
+    'user_id', 'session_key', 'duration', 'prompt_ref', 'typed_text', 'wpm', 'accuracy', 'typing_time',
+    'composite_score', 'completed', 'correct_chars', 'incorrect_chars', 'total_chars', 'started_at', 'completed_at',
+])
+
+
+class SessionInserter:
+    """
+    Inserts SessionRows with one parameterised executemany per chunk.
+
+    bulk_create compiles every value of every row into its statement (and
+    SQLite's parameter limit caps it at a few dozen rows per INSERT), which
+    costs far more than generating the rows; the statement here is built once.
+    """
+
+    def __init__(self):
+        opts = TestSession._meta
+        quote = connection.ops.quote_name
+        fields = [opts.get_field(name) for name in SessionRow._fields]
+        defaults = [
+            field for field in opts.concrete_fields
+            if not field.primary_key and field.name not in SessionRow._fields
+        ]
+        self.defaults = tuple(field.get_db_prep_save(field.get_default(), connection) for field in defaults)
+        columns = [quote(field.column) for field in fields + defaults]
+        self.sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(opts.db_table), ', '.join(columns), ', '.join(['%s'] * len(columns))
+        )
+        self.adapt = connection.ops.adapt_datetimefield_value
+
+    def insert(self, rows):
+        adapt, defaults = self.adapt, self.defaults
+        params = [(*row[:-2], adapt(row.started_at), adapt(row.completed_at), *defaults) for row in rows]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(self.sql, params)
+
+
+class SessionFactory:
+    """Draws sessions with realistic skill, accuracy, duration and time distributions"""
+
+    def __init__(self, users, rng, now, incomplete_share, guest_share):
+        self.rng = rng
+        self.now = now
+        self.incomplete_share = incomplete_share
+        self.guest_share = guest_share
+        self.users = users
+        # Activity is heavily skewed: a few users take most of the tests
+        self.cum_weights = list(accumulate(user['activity'] for user in users))
+        self.durations, duration_shares = zip(*DURATION_MIX.items())
+        self.duration_weights = list(accumulate(duration_shares))
+        difficulties, difficulty_shares = zip(*DIFFICULTY_MIX.items())
+        self.prompts = {}
+        for duration in self.durations:
+            # Same prompt length as the fallback generator uses for the duration
+            self.prompts[duration] = [
+                make_prompt_ref(difficulty, max(20, duration * 2), seed=rng.getrandbits(32))
+                for difficulty in rng.choices(difficulties, difficulty_shares, k=PROMPTS_PER_KIND)
+            ]
+        # Start and length of each word in each prompt, where mistakes are placed
+        self.words = {}
+        for refs in self.prompts.values():
+            for ref in refs:
+                starts, lengths, start = [], [], 0
+                for word in generate_text(ref).split(' '):
+                    starts.append(start)
+                    lengths.append(len(word))
+                    start += len(word) + 1
+                self.words[ref] = (starts, lengths)
+
+    def pick_user(self):
+        return self.users[bisect.bisect(self.cum_weights, self.rng.random() * self.cum_weights[-1])]
+
+    def build(self):
+        rng = self.rng
+        user = None if rng.random() < self.guest_share else self.pick_user()
+        duration = self.durations[bisect.bisect(self.duration_weights, rng.random() * self.duration_weights[-1])]
+        prompt_ref = rng.choice(self.prompts[duration])
+        # Sessions fall between the user joining and now, denser towards now
+        age = (user['joined_days'] if user else 30) * rng.random() ** 1.5
+        started_at = self.now - timedelta(days=age, seconds=duration)
+        user_id = user['id'] if user else None
+        session_key = None if user else secrets.token_hex(16)
+
+        if rng.random() < self.incomplete_share:
+            return SessionRow(user_id, session_key, duration, prompt_ref, '', 0, 0, 0, 0, False, 0, 0, 0, started_at, None)
+
+        skill = user['skill'] if user else rng.lognormvariate(math.log(45), 0.35)
+        precision = user['precision'] if user else rng.gauss(94, 3)
+        target_accuracy = max(50.0, min(100.0, rng.gauss(precision, 2.0)))
+        target_wpm = max(5.0, rng.gauss(skill * DURATION_PACE[duration], skill * 0.08))
+
+        prompt = generate_text(prompt_ref)
+        total_chars = min(len(prompt), int(target_wpm * 5 * duration / 60))
+        # At most one wrong letter per finished word, like most real typos; word
+        # boundaries are kept, so the scorer aligns the text exactly as intended
+        starts, lengths = self.words[prompt_ref]
+        available = bisect.bisect_right(starts, prompt.rfind(' ', 0, total_chars))
+        incorrect = min(available, total_chars - round(total_chars * target_accuracy / 100))
+        pieces = []
+        previous = 0
+        mistakes = sorted(starts[i] + rng.randrange(lengths[i]) for i in rng.sample(range(available), incorrect))
+        for position in mistakes:
+            pieces.append(prompt[previous:position])
+            pieces.append('#')
+            previous = position + 1
+        pieces.append(prompt[previous:total_chars])
+
+        # The values calculate_typing_metrics gives this typed text
+        accuracy = (total_chars - incorrect) / total_chars * 100 if total_chars else 0
+        wpm = round(total_chars / 5 / (duration / 60) * (accuracy / 100), 2)
+        accuracy = round(accuracy, 2)
+        return SessionRow(
+            user_id, session_key, duration, prompt_ref, ''.join(pieces), wpm, accuracy, duration,
+            TestSession.calculate_composite_score(wpm, accuracy), True,
+            total_chars - incorrect, incorrect, total_chars,
+            started_at, started_at + timedelta(seconds=duration),
+        )
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users and test sessions (with consistent UserStats) for scale testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000, help='Users to create (default: 1000)')
+        parser.add_argument('--sessions', type=int, default=100000, help='Test sessions to create (default: 100000)')
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Sessions built and inserted per batch; bounds memory use (default: 10000)'
+        )
+        parser.add_argument('--days', type=int, default=365, help='Spread of join dates in days (default: 365)')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for reproducible data')
+        parser.add_argument('--prefix', default='load', help='Username prefix for generated users (default: load)')
+        parser.add_argument(
+            '--incomplete-share', type=float, default=0.08,
+            help='Share of sessions abandoned before completion (default: 0.08)'
+        )
+        parser.add_argument(
+            '--guest-share', type=float, default=0.05,
+            help='Share of sessions typed without an account (default: 0.05)'
+        )
+        parser.add_argument(
+            '--keep-indexes', action='store_true',
+            help='Insert with indexes in place instead of dropping and rebuilding them'
+        )
+        parser.add_argument(
+            '--leaderboards', action='store_true',
+            help='Also run rerank_leaderboards --rebuild (slow on millions of sessions)'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['sessions'] < 0 or options['chunk_size'] < 1:
+            raise CommandError('--users and --chunk-size must be positive and --sessions not negative')
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        started = time.monotonic()
+
+        users = self.create_users(rng, now, options)
+        self.stdout.write(f'Created {len(users)} users')
+
+        factory = SessionFactory(users, rng, now, options['incomplete_share'], options['guest_share'])
+        inserter = SessionInserter()
+        totals = {}
+        test_counts = {}
+        with nullcontext() if options['keep_indexes'] else deferred_indexes(TestSession, self.stdout):
+            remaining = options['sessions']
+            while remaining:
+                chunk = [factory.build() for _ in range(min(options['chunk_size'], remaining))]
+                inserter.insert(chunk)
+                self.add_totals(chunk, totals, test_counts)
+                remaining -= len(chunk)
+                created = options['sessions'] - remaining
+                self.stdout.write(f'  {created} sessions ({created / (time.monotonic() - started):,.0f}/s)')
+
+        self.create_stats(users, totals, test_counts)
+        if options['leaderboards']:
+            call_command('rerank_leaderboards', '--rebuild', stdout=io.StringIO())
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(users)} users and {options["sessions"]} sessions in {time.monotonic() - started:.1f}s'
+        ))
+
+    def create_users(self, rng, now, options):
+        prefix = options['prefix']
+        first = User.objects.filter(username__startswith=prefix).count()
+        password = make_password(None)
+        users = []
+        for start in range(first, first + options['users'], options['chunk_size']):
+            batch = [
+                User(
+                    username=f'{prefix}{n}',
+                    email=f'{prefix}{n}@example.com',
+                    password=password,
+                    date_joined=now - timedelta(days=options['days'] * rng.random()),
+                )
+                for n in range(start, min(start + options['chunk_size'], first + options['users']))
+            ]
+            # Ids are set by bulk_create on SQLite and PostgreSQL
+            User.objects.bulk_create(batch)
+            users.extend(batch)
+
+        return [
+            {
+                'id': user.id,
+                'joined_days': (now - user.date_joined).total_seconds() / 86400,
+                # Median around 50 WPM with a long fast tail
+                'skill': rng.lognormvariate(math.log(50), 0.35),
+                'precision': min(99.5, rng.gauss(95, 2.5)),
+                'activity': rng.paretovariate(1.16),
+            }
+            for user in users
+        ]
+
+    @staticmethod
+    def add_totals(sessions, totals, test_counts):
+        """Accumulate the grouped values reconcile_user_stats would read back, per (user, duration)"""
+        for session in sessions:
+            if session.user_id is None:
+                continue
+            test_counts[session.user_id] = test_counts.get(session.user_id, 0) + 1
+            if not session.completed:
+                continue
+            row = totals.get((session.user_id, session.duration))
+            if row is None:
+                totals[(session.user_id, session.duration)] = {
+                    'duration': session.duration,
+                    'count': 1,
+                    'wpm_sum': session.wpm,
+                    'accuracy_sum': session.accuracy,
+                    'best_wpm': session.wpm,
+                    'best_accuracy': session.accuracy,
+                    'time_typed': session.typing_time,
+                    'last_completed': session.completed_at,
+                }
+                continue
+            row['count'] += 1
+            row['wpm_sum'] += session.wpm
+            row['accuracy_sum'] += session.accuracy
+            row['best_wpm'] = max(row['best_wpm'], session.wpm)
+            row['best_accuracy'] = max(row['best_accuracy'], session.accuracy)
+            row['time_typed'] += session.typing_time
+            row['last_completed'] = max(row['last_completed'], session.completed_at)
+
+    def create_stats(self, users, totals, test_counts):
+        by_user = {}
+        for (user_id, _), row in totals.items():
+            by_user.setdefault(user_id, []).append(row)
+
+        stats = []
+        for user in users:
+            user_stats = UserStats(user_id=user['id'], total_tests=test_counts.get(user['id'], 0))
+            ReconcileCommand.apply_totals(user_stats, by_user.get(user['id'], []))
+            stats.append(user_stats)
+        UserStats.objects.bulk_create(stats, batch_size=5000)
+        self.stdout.write(f'Created stats for {len(stats)} users')
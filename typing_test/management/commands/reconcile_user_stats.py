@@ -0,0 +1,105 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Max, Sum
+from accounts.models import User
+from typing_test.models import TestSession, UserStats
+
+RECONCILED_FIELDS = ['completed_tests', 'total_tests', 'completion_rate', 'avg_wpm', 'avg_accuracy',
+                     'total_time_typed', 'last_test_at']
+for _duration in UserStats.DURATIONS:
+    RECONCILED_FIELDS += [
+        f'completed_tests_{_duration}s', f'wpm_sum_{_duration}s', f'accuracy_sum_{_duration}s',
+        f'best_wpm_{_duration}s', f'best_accuracy_{_duration}s',
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Recompute UserStats running sums, averages and bests from completed test sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Number of users reconciled per grouped query (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        last_id = 0
+        reconciled = 0
+
+        while True:
+            user_ids = list(
+                User.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+            )
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            reconciled += self.reconcile_chunk(user_ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Reconciled stats for {reconciled} users'))
+
+    def reconcile_chunk(self, user_ids):
+        # One grouped query covers every (user, duration) pair in the chunk
+        totals = (
+            TestSession.objects.filter(completed=True, user_id__in=user_ids)
+            .values('user_id', 'duration')
+            .annotate(
+                count=Count('id'),
+                wpm_sum=Sum('wpm'),
+                accuracy_sum=Sum('accuracy'),
+                best_wpm=Max('wpm'),
+                best_accuracy=Max('accuracy'),
+                time_typed=Sum('typing_time'),
+                last_completed=Max('completed_at'),
+            )
+            .order_by()
+        )
+        by_user = {}
+        for row in totals:
+            by_user.setdefault(row['user_id'], []).append(row)
+
+        existing = {stats.user_id: stats for stats in UserStats.objects.filter(user_id__in=user_ids)}
+        to_create = []
+        for user_id in user_ids:
+            rows = by_user.get(user_id, [])
+            stats = existing.get(user_id)
+            if stats is None:
+                if not rows:
+                    continue
+                stats = UserStats(user_id=user_id)
+                to_create.append(stats)
+            self.apply_totals(stats, rows)
+
+        UserStats.objects.bulk_update(existing.values(), RECONCILED_FIELDS)
+        UserStats.objects.bulk_create(to_create)
+        return len(existing) + len(to_create)
+
+    @staticmethod
+    def apply_totals(stats, rows):
+        for duration in UserStats.DURATIONS:
+            setattr(stats, f'completed_tests_{duration}s', 0)
+            setattr(stats, f'wpm_sum_{duration}s', 0.0)
+            setattr(stats, f'accuracy_sum_{duration}s', 0.0)
+            setattr(stats, f'best_wpm_{duration}s', None)
+            setattr(stats, f'best_accuracy_{duration}s', None)
+
+        time_typed = 0.0
+        last_test_at = None
+        for row in rows:
+            # Sessions of a duration without its own columns count towards the totals only
+            if row['duration'] in UserStats.DURATIONS:
+                suffix = f'{row["duration"]}s'
+                setattr(stats, f'completed_tests_{suffix}', row['count'])
+                setattr(stats, f'wpm_sum_{suffix}', row['wpm_sum'] or 0.0)
+                setattr(stats, f'accuracy_sum_{suffix}', row['accuracy_sum'] or 0.0)
+                setattr(stats, f'best_wpm_{suffix}', row['best_wpm'])
+                setattr(stats, f'best_accuracy_{suffix}', row['best_accuracy'])
+            time_typed += row['time_typed'] or 0.0
+            if row['last_completed'] and (last_test_at is None or row['last_completed'] > last_test_at):
+                last_test_at = row['last_completed']
+
+        stats.completed_tests = sum(row['count'] for row in rows)
+        stats.total_tests = max(stats.total_tests, stats.completed_tests)
+        stats.completion_rate = (stats.completed_tests / stats.total_tests * 100) if stats.total_tests > 0 else 0
+        stats.total_time_typed = int(time_typed)
+        stats.last_test_at = last_test_at
+        stats.refresh_averages()
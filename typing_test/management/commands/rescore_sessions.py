@@ -0,0 +1,197 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import islice
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections, transaction
+from django.db.models import Max, Min
+from typing_test.models import SessionText, TestSession
+
+RESCORED_FIELDS = [
+    'wpm', 'accuracy', 'composite_score', 'correct_chars', 'incorrect_chars', 'extra_chars', 'missed_chars',
+    'total_chars',
+]
+
+
+def _init_worker():
+    # Spawned workers start without Django; forked ones must not share the parent's connections
+    django.setup()
+    connections.close_all()
+
+
+def write_scores(sessions):
+    """
+    Store RESCORED_FIELDS for sessions with one executemany.
+
+    bulk_update builds a CASE expression per field per row, and compiling it
+    costs more than the scoring itself at this volume; a parameterised
+    UPDATE per row is sent as a single prepared statement instead.
+    """
+    opts = TestSession._meta
+    quote = connection.ops.quote_name
+    columns = [opts.get_field(field).column for field in RESCORED_FIELDS]
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(opts.db_table),
+        ', '.join(f'{quote(column)} = %s' for column in columns),
+        quote(opts.pk.column),
+    )
+    rows = [[getattr(session, field) for field in RESCORED_FIELDS] + [session.pk] for session in sessions]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def rescore_range(low, high, chunk_size, batch_size):
+    """
+    Re-score completed sessions with low <= id < high.
+
+    Returns ``(scanned, changed)``. Writes are idempotent, so a range that
+    was interrupted can simply be run again.
+    """
+    from typing_test.views import calculate_typing_metrics
+
+    sessions = (
+        TestSession.objects.filter(completed=True, id__gte=low, id__lt=high)
+        .order_by('id')
+        .only('id', 'text_id', 'text_content', 'prompt_ref', 'typed_text', 'typing_time', *RESCORED_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    texts = {}
+    scanned = changed = 0
+    while True:
+        batch = list(islice(sessions, batch_size))
+        if not batch:
+            break
+        scanned += len(batch)
+
+        # Prompts shared by the batch are read in one query
+        missing = {s.text_id for s in batch if s.text_id is not None and not s.prompt_ref} - texts.keys()
+        if missing:
+            if len(texts) > 10000:
+                texts.clear()
+            texts.update(SessionText.objects.filter(id__in=missing).values_list('id', 'content'))
+
+        updates = []
+        for session in batch:
+            if session.prompt_ref or session.text_id is None:
+                prompt = session.prompt
+            else:
+                prompt = texts[session.text_id]
+            metrics = calculate_typing_metrics(prompt, session.typed_text, session.typing_time)
+            metrics['composite_score'] = TestSession.calculate_composite_score(metrics['wpm'], metrics['accuracy'])
+            if any(getattr(session, field) != metrics[field] for field in RESCORED_FIELDS):
+                for field in RESCORED_FIELDS:
+                    setattr(session, field, metrics[field])
+                updates.append(session)
+
+        if updates:
+            write_scores(updates)
+            changed += len(updates)
+
+    return scanned, changed
+
+
+class Command(BaseCommand):
+    help = 'Recompute wpm, accuracy and character counts of completed sessions with the current scoring'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Rows fetched per database round trip while streaming (default: 2000)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Sessions scored and written per executemany UPDATE (default: 500)'
+        )
+        parser.add_argument(
+            '--range-size', type=int, default=50000,
+            help='Ids per unit of work; progress is checkpointed per range (default: 50000)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Processes re-scoring ranges in parallel (default: 1)'
+        )
+        parser.add_argument(
+            '--checkpoint', default=str(settings.BASE_DIR / 'rescore_sessions.checkpoint.json'),
+            help='File recording finished ranges, used to resume an interrupted run '
+                 '(default: rescore_sessions.checkpoint.json in the project directory)'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Ignore an existing checkpoint and re-score every range'
+        )
+
+    def handle(self, *args, **options):
+        path = options['checkpoint']
+        checkpoint = self.load_checkpoint(path, options)
+        range_size = checkpoint['range_size']
+
+        pending = [
+            (low, min(low + range_size, checkpoint['end']))
+            for low in range(checkpoint['start'], checkpoint['end'], range_size)
+            if low not in checkpoint['done']
+        ]
+        if not pending:
+            self.stdout.write(self.style.SUCCESS('Nothing to re-score'))
+            return
+        self.stdout.write(f'Re-scoring {len(pending)} id ranges with {options["workers"]} worker(s)')
+
+        args = (options['chunk_size'], options['batch_size'])
+        scanned = changed = 0
+        if options['workers'] > 1:
+            # Forked workers must not inherit open connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                futures = {pool.submit(rescore_range, low, high, *args): low for low, high in pending}
+                for future in as_completed(futures):
+                    counts = future.result()
+                    scanned, changed = scanned + counts[0], changed + counts[1]
+                    self.finish_range(path, checkpoint, futures[future], counts)
+        else:
+            for low, high in pending:
+                counts = rescore_range(low, high, *args)
+                scanned, changed = scanned + counts[0], changed + counts[1]
+                self.finish_range(path, checkpoint, low, counts)
+
+        os.remove(path)
+        self.stdout.write(self.style.SUCCESS(f'Re-scored {scanned} sessions, {changed} changed'))
+        if changed:
+            self.stdout.write(
+                'Run reconcile_user_stats and rerank_leaderboards --rebuild to refresh stats and leaderboards'
+            )
+
+    def load_checkpoint(self, path, options):
+        if os.path.exists(path) and not options['restart']:
+            with open(path) as f:
+                checkpoint = json.load(f)
+            checkpoint['done'] = set(checkpoint['done'])
+            self.stdout.write(f'Resuming from {path}: {len(checkpoint["done"])} ranges already done')
+            return checkpoint
+
+        if options['range_size'] < 1 or options['batch_size'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('Sizes must be positive')
+        # Sessions completed after this run starts are scored by the current code already
+        bounds = TestSession.objects.filter(completed=True).aggregate(start=Min('id'), end=Max('id'))
+        checkpoint = {
+            'start': bounds['start'] or 0,
+            'end': (bounds['end'] or -1) + 1,
+            'range_size': options['range_size'],
+            'done': set(),
+        }
+        self.save_checkpoint(path, checkpoint)
+        return checkpoint
+
+    @staticmethod
+    def save_checkpoint(path, checkpoint):
+        # Write then rename so an interrupted write never leaves a corrupt file
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({**checkpoint, 'done': sorted(checkpoint['done'])}, f)
+        os.replace(temporary, path)
+
+    def finish_range(self, path, checkpoint, low, counts):
+        checkpoint['done'].add(low)
+        self.save_checkpoint(path, checkpoint)
+        self.stdout.write(f'  ids {low}+: {counts[0]} scanned, {counts[1]} changed')
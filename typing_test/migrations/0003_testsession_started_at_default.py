@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('typing_test', '0002_textcontent_category_textcontent_language_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='testsession',
+            name='started_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
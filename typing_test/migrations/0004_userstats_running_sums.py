@@ -0,0 +1,81 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:52
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_running_sums(apps, schema_editor):
+    TestSession = apps.get_model('typing_test', 'TestSession')
+    UserStats = apps.get_model('typing_test', 'UserStats')
+
+    totals = (
+        TestSession.objects.filter(completed=True, user__isnull=False)
+        .values('user_id', 'duration')
+        .annotate(count=Count('id'), wpm_sum=Sum('wpm'), accuracy_sum=Sum('accuracy'))
+    )
+    by_user = {}
+    for row in totals.iterator():
+        by_user.setdefault(row['user_id'], []).append(row)
+
+    for stats in UserStats.objects.filter(user_id__in=list(by_user)).iterator():
+        for row in by_user[stats.user_id]:
+            setattr(stats, f'completed_tests_{row["duration"]}s', row['count'])
+            setattr(stats, f'wpm_sum_{row["duration"]}s', row['wpm_sum'] or 0.0)
+            setattr(stats, f'accuracy_sum_{row["duration"]}s', row['accuracy_sum'] or 0.0)
+        stats.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('typing_test', '0003_testsession_started_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='accuracy_sum_15s',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='accuracy_sum_30s',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='accuracy_sum_60s',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='completed_tests_15s',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='completed_tests_30s',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='completed_tests_60s',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='wpm_sum_15s',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='wpm_sum_30s',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='wpm_sum_60s',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(backfill_running_sums, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('typing_test', '0004_userstats_running_sums'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testsession',
+            name='composite_score',
+            field=models.FloatField(default=0.0, help_text='Weighted score (70% WPM, 30% accuracy)'),
+        ),
+        migrations.AddIndex(
+            model_name='testsession',
+            index=models.Index(condition=models.Q(('completed', True)), fields=['duration', '-composite_score'], name='session_score_idx'),
+        ),
+    ]
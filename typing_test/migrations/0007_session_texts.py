@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('typing_test', '0006_testsession_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SessionText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'session_texts',
+            },
+        ),
+        migrations.AlterField(
+            model_name='testsession',
+            name='text_content',
+            field=models.TextField(blank=True, default='', help_text='Inline prompt of sessions stored before SessionText'),
+        ),
+        migrations.AddField(
+            model_name='testsession',
+            name='text',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='sessions', to='typing_test.sessiontext'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+import hashlib
+
+from django.db import migrations, transaction
+
+# Sessions moved per transaction; each chunk commits on its own
+CHUNK_SIZE = 2000
+
+
+def move_texts_to_session_texts(apps, schema_editor):
+    TestSession = apps.get_model('typing_test', 'TestSession')
+    SessionText = apps.get_model('typing_test', 'SessionText')
+
+    last_id = 0
+    while True:
+        chunk = list(
+            TestSession.objects.filter(id__gt=last_id, text__isnull=True)
+            .order_by('id')
+            .only('id', 'text_content')[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        by_digest = {hashlib.sha256(s.text_content.encode('utf-8')).hexdigest(): s.text_content for s in chunk}
+        with transaction.atomic():
+            ids = dict(SessionText.objects.filter(digest__in=list(by_digest)).values_list('digest', 'id'))
+            new = [SessionText(digest=d, content=c) for d, c in by_digest.items() if d not in ids]
+            SessionText.objects.bulk_create(new, ignore_conflicts=True)
+            ids.update(SessionText.objects.filter(digest__in=[t.digest for t in new]).values_list('digest', 'id'))
+
+            for session in chunk:
+                session.text_id = ids[hashlib.sha256(session.text_content.encode('utf-8')).hexdigest()]
+                session.text_content = ''
+            TestSession.objects.bulk_update(chunk, ['text', 'text_content'], batch_size=500)
+
+
+def restore_inline_texts(apps, schema_editor):
+    TestSession = apps.get_model('typing_test', 'TestSession')
+
+    last_id = 0
+    while True:
+        chunk = list(
+            TestSession.objects.filter(id__gt=last_id, text__isnull=False)
+            .select_related('text')
+            .order_by('id')[:CHUNK_SIZE]
+        )
+        if not chunk:
+            break
+        last_id = chunk[-1].id
+
+        for session in chunk:
+            session.text_content = session.text.content
+            session.text = None
+        with transaction.atomic():
+            TestSession.objects.bulk_update(chunk, ['text', 'text_content'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    # Chunks commit independently so large tables are not rewritten in one transaction
+    atomic = False
+
+    dependencies = [
+        ('typing_test', '0007_session_texts'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_texts_to_session_texts, restore_inline_texts),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('typing_test', '0008_dedupe_session_texts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testsession',
+            name='prompt_ref',
+            field=models.CharField(blank=True, help_text='Seeded generator reference', max_length=40, null=True),
+        ),
+    ]
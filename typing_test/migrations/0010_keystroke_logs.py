@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('typing_test', '0009_testsession_prompt_ref'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KeystrokeLog',
+            fields=[
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='keystroke_log', serialize=False, to='typing_test.testsession')),
+                ('version', models.PositiveSmallIntegerField()),
+                ('event_count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'keystroke_logs',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('typing_test', '0010_keystroke_logs'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='testsession',
+            name='session_score_idx',
+        ),
+        migrations.AddField(
+            model_name='testsession',
+            name='flagged',
+            field=models.BooleanField(default=False, help_text='Excluded from leaderboards by anti-cheat analysis'),
+        ),
+        migrations.AddField(
+            model_name='testsession',
+            name='plausibility',
+            field=models.FloatField(blank=True, help_text='Keystroke timing score, 0 (scripted) to 100', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='testsession',
+            index=models.Index(condition=models.Q(('completed', True), ('flagged', False)), fields=['duration', '-composite_score'], name='session_score_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-17 00:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('typing_test', '0011_session_plausibility'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testsession',
+            name='extra_chars',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testsession',
+            name='missed_chars',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,10 +1,83 @@
-from django.db import models
+import hashlib
+
+from django.db import connection, models, transaction
+from django.db.models import Case, ExpressionWrapper, F, Q, Value, When
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
+from .generator import generate_text
+from .keystrokes import decode_log
+
 User = get_user_model()
 
+# Per-process caches of immutable SessionText rows (digest -> id, id -> content)
+TEXT_CACHE_SIZE = 2048
+_text_ids = {}
+_text_contents = {}
+
+
+def _remember(store, key, value):
+    # Rows created inside a transaction may still be rolled back
+    if connection.in_atomic_block:
+        return
+    if len(store) >= TEXT_CACHE_SIZE:
+        store.clear()
+    store[key] = value
+
+
+class SessionText(models.Model):
+    """Prompt text stored once and shared by every session that typed it"""
+    digest = models.CharField(max_length=64, unique=True)  # SHA-256 of content
+    content = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'session_texts'
+    
+    def __str__(self):
+        return f"{self.digest[:12]} ({len(self.content)} chars)"
+    
+    @staticmethod
+    def digest_for(content):
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+    
+    @classmethod
+    def intern(cls, content):
+        """Return the id of the row holding `content`, creating it if needed"""
+        return cls.intern_many([content])[content]
+    
+    @classmethod
+    def intern_many(cls, contents):
+        """Return {content: id} for several texts with at most three queries"""
+        by_digest = {cls.digest_for(content): content for content in set(contents)}
+        ids = {digest: _text_ids[digest] for digest in by_digest if digest in _text_ids}
+        
+        missing = [digest for digest in by_digest if digest not in ids]
+        if missing:
+            found = dict(cls.objects.filter(digest__in=missing).values_list('digest', 'id'))
+            new = [digest for digest in missing if digest not in found]
+            if new:
+                # Concurrent inserts of the same text are absorbed by the unique digest
+                cls.objects.bulk_create(
+                    [cls(digest=digest, content=by_digest[digest]) for digest in new],
+                    ignore_conflicts=True
+                )
+                found.update(cls.objects.filter(digest__in=new).values_list('digest', 'id'))
+            for digest, text_id in found.items():
+                _remember(_text_ids, digest, text_id)
+            ids.update(found)
+        
+        return {by_digest[digest]: text_id for digest, text_id in ids.items()}
+    
+    @classmethod
+    def content_for(cls, text_id):
+        content = _text_contents.get(text_id)
+        if content is None:
+            content = cls.objects.values_list('content', flat=True).get(id=text_id)
+            _remember(_text_contents, text_id, content)
+        return content
+
 
 class TestSession(models.Model):
     """Individual typing test session"""
@@ -16,31 +89,41 @@ class TestSession(models.Model):
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='test_sessions', null=True, blank=True)
     duration = models.PositiveSmallIntegerField(choices=DURATION_CHOICES, db_index=True)
-    text_content = models.TextField()
+    text = models.ForeignKey(SessionText, on_delete=models.PROTECT, null=True, blank=True, related_name='sessions')
+    text_content = models.TextField(blank=True, default='', help_text="Inline prompt of sessions stored before SessionText")
+    prompt_ref = models.CharField(max_length=40, null=True, blank=True, help_text="Seeded generator reference")
     typed_text = models.TextField()
     
     # Performance Metrics
     wpm = models.FloatField(validators=[MinValueValidator(0.0)], db_index=True)
     accuracy = models.FloatField(validators=[MinValueValidator(0.0), MaxValueValidator(100.0)])
     typing_time = models.FloatField(help_text="Actual time taken in seconds")
+    composite_score = models.FloatField(default=0.0, help_text="Weighted score (70% WPM, 30% accuracy)")
     completed = models.BooleanField(default=False, db_index=True)
     
     # Timestamps
-    started_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(default=timezone.now)
     completed_at = models.DateTimeField(null=True, blank=True)
     
     # Additional metrics
     correct_chars = models.PositiveIntegerField(default=0)
     incorrect_chars = models.PositiveIntegerField(default=0)
+    extra_chars = models.PositiveIntegerField(default=0)
+    missed_chars = models.PositiveIntegerField(default=0)
     total_chars = models.PositiveIntegerField(default=0)
     
     # Anti-cheating fields
     focus_lost_count = models.PositiveIntegerField(default=0)
     suspicious_events = models.JSONField(default=list, blank=True)
+    plausibility = models.FloatField(null=True, blank=True, help_text="Keystroke timing score, 0 (scripted) to 100")
+    flagged = models.BooleanField(default=False, help_text="Excluded from leaderboards by anti-cheat analysis")
     
     # Guest session support
     session_key = models.CharField(max_length=40, null=True, blank=True, db_index=True)
     
+    # Client-generated key so retried batch uploads are stored once
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True)
+    
     class Meta:
         db_table = 'typing_test_sessions'
         indexes = [
@@ -50,6 +133,12 @@ class TestSession(models.Model):
             models.Index(fields=['-wpm']),                 # Global leaderboard
             models.Index(fields=['user', 'duration', '-wpm']), # User best by duration
             models.Index(fields=['session_key']),          # Guest sessions
+            models.Index(fields=['duration', '-composite_score'], name='session_score_idx',
+                         condition=models.Q(completed=True, flagged=False)),  # Leaderboard by score
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='session_idempotency_key',
+                                    condition=models.Q(idempotency_key__isnull=False)),
         ]
         ordering = ['-started_at']
     
@@ -57,14 +146,57 @@ class TestSession(models.Model):
         user_info = self.user.username if self.user else f"Guest-{self.session_key[:8]}"
         return f"{user_info} - {self.duration}s - {self.wpm}WPM"
     
+    @staticmethod
+    def calculate_composite_score(wpm, accuracy):
+        """Calculate weighted composite score (70% WPM, 30% accuracy)"""
+        return round((wpm * 0.7) + (accuracy * 0.3), 2)
+    
+    @property
+    def prompt(self):
+        """The text this session was asked to type"""
+        if self.prompt_ref:
+            return generate_text(self.prompt_ref)
+        if self.text_id is None:
+            return self.text_content
+        if TestSession.text.is_cached(self):
+            return self.text.content
+        return SessionText.content_for(self.text_id)
+    
+    def set_prompt(self, content):
+        self.text_id = SessionText.intern(content)
+        self.text_content = ''
+    
     def save(self, *args, **kwargs):
         if self.completed and not self.completed_at:
             self.completed_at = timezone.now()
+        if self.completed:
+            self.composite_score = self.calculate_composite_score(self.wpm, self.accuracy)
         super().save(*args, **kwargs)
 
 
+class KeystrokeLog(models.Model):
+    """Binary keystroke capture of one session (format in typing_test.keystrokes)"""
+    session = models.OneToOneField(TestSession, on_delete=models.CASCADE, primary_key=True,
+                                   related_name='keystroke_log')
+    version = models.PositiveSmallIntegerField()
+    event_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'keystroke_logs'
+    
+    def __str__(self):
+        return f"Session {self.session_id} - {self.event_count} keystrokes"
+    
+    def decode(self):
+        return decode_log(bytes(self.data))
+
+
 class UserStats(models.Model):
     """Aggregated user statistics for performance optimization"""
+    DURATIONS = (15, 30, 60)
+    
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='stats')
     
     # Overall statistics
@@ -85,6 +217,19 @@ class UserStats(models.Model):
     avg_wpm = models.FloatField(default=0.0, db_index=True)
     avg_accuracy = models.FloatField(default=0.0)
     
+    # Running sums and counts by duration (averages are derived from these)
+    completed_tests_15s = models.PositiveIntegerField(default=0)
+    completed_tests_30s = models.PositiveIntegerField(default=0)
+    completed_tests_60s = models.PositiveIntegerField(default=0)
+    
+    wpm_sum_15s = models.FloatField(default=0.0)
+    wpm_sum_30s = models.FloatField(default=0.0)
+    wpm_sum_60s = models.FloatField(default=0.0)
+    
+    accuracy_sum_15s = models.FloatField(default=0.0)
+    accuracy_sum_30s = models.FloatField(default=0.0)
+    accuracy_sum_60s = models.FloatField(default=0.0)
+    
     # Streaks and achievements
     current_streak = models.PositiveIntegerField(default=0)
     longest_streak = models.PositiveIntegerField(default=0)
@@ -108,40 +253,118 @@ class UserStats(models.Model):
     def __str__(self):
         return f"{self.user.username} - Stats"
     
-    def update_stats_from_session(self, session):
-        """Update stats based on a new test session"""
-        self.total_tests += 1
-        if session.completed:
-            self.completed_tests += 1
-            
-            # Update best WPM by duration
-            wpm_field = f'best_wpm_{session.duration}s'
-            current_best = getattr(self, wpm_field, None)
-            if current_best is None or session.wpm > current_best:
-                setattr(self, wpm_field, session.wpm)
-            
-            # Update best accuracy by duration
-            accuracy_field = f'best_accuracy_{session.duration}s'
-            current_best_acc = getattr(self, accuracy_field, None)
-            if current_best_acc is None or session.accuracy > current_best_acc:
-                setattr(self, accuracy_field, session.accuracy)
-            
-            # Update averages (simplified - in production you'd want running averages)
-            completed_sessions = TestSession.objects.filter(
-                user=self.user, completed=True
-            )
-            self.avg_wpm = completed_sessions.aggregate(
-                models.Avg('wpm')
-            )['wpm__avg'] or 0.0
-            self.avg_accuracy = completed_sessions.aggregate(
-                models.Avg('accuracy')
-            )['accuracy__avg'] or 0.0
+    def refresh_averages(self):
+        """Recompute avg_wpm and avg_accuracy from the running sums"""
+        count = sum(getattr(self, f'completed_tests_{d}s') for d in self.DURATIONS)
+        if count:
+            self.avg_wpm = sum(getattr(self, f'wpm_sum_{d}s') for d in self.DURATIONS) / count
+            self.avg_accuracy = sum(getattr(self, f'accuracy_sum_{d}s') for d in self.DURATIONS) / count
+        else:
+            self.avg_wpm = 0.0
+            self.avg_accuracy = 0.0
+    
+    @classmethod
+    def record_session(cls, session):
+        """
+        Fold a completed session into its user's stats.
+        
+        Returns True if the session set a new best WPM.
+        """
+        return bool(cls.record_sessions(session.user_id, [session]))
+    
+    @classmethod
+    def record_sessions(cls, user_id, sessions):
+        """
+        Fold a batch of one user's completed sessions into their stats.
+        
+        Counters, running sums and bests are updated with conditional UPDATE
+        statements so concurrent completions for the same user never lose
+        writes: one statement for the whole batch plus one per duration for
+        best WPM. Sessions of a duration without its own columns count
+        towards the totals only. Returns the durations whose best WPM was
+        beaten.
+        """
+        if not sessions:
+            return []
+        by_duration = {}
+        for session in sessions:
+            if session.duration in cls.DURATIONS:
+                by_duration.setdefault(session.duration, []).append(session)
+        
+        count = len(sessions)
+        latest = max(session.completed_at for session in sessions)
+        changes = {
+            'total_tests': F('total_tests') + count,
+            'completed_tests': F('completed_tests') + count,
+            'completion_rate': ExpressionWrapper(
+                (F('completed_tests') + count) * 100.0 / (F('total_tests') + count),
+                output_field=models.FloatField()
+            ),
+            'total_time_typed': F('total_time_typed') + sum(int(session.typing_time) for session in sessions),
+            # Offline uploads may be older than the last test, so this only moves forward
+            'last_test_at': Case(
+                When(cls._beaten('last_test_at', latest), then=Value(latest, output_field=models.DateTimeField())),
+                default=F('last_test_at'),
+            ),
+            'updated_at': timezone.now(),
+        }
+        if by_duration:
+            # Averages over the per-duration sums after this batch, computed from the row's current values
+            counted = [session for group in by_duration.values() for session in group]
+            count_total = sum((F(f'completed_tests_{d}s') for d in cls.DURATIONS), Value(len(counted)))
+            wpm = float(sum(session.wpm for session in counted))
+            accuracy = float(sum(session.accuracy for session in counted))
+            wpm_total = sum((F(f'wpm_sum_{d}s') for d in cls.DURATIONS), Value(wpm))
+            accuracy_total = sum((F(f'accuracy_sum_{d}s') for d in cls.DURATIONS), Value(accuracy))
+            changes['avg_wpm'] = ExpressionWrapper(wpm_total / count_total, output_field=models.FloatField())
+            changes['avg_accuracy'] = ExpressionWrapper(accuracy_total / count_total, output_field=models.FloatField())
+        for duration, group in by_duration.items():
+            suffix = f'{duration}s'
+            best_accuracy_field = f'best_accuracy_{suffix}'
+            best_accuracy = max(session.accuracy for session in group)
+            changes.update({
+                f'completed_tests_{suffix}': F(f'completed_tests_{suffix}') + len(group),
+                f'wpm_sum_{suffix}': F(f'wpm_sum_{suffix}') + sum(session.wpm for session in group),
+                f'accuracy_sum_{suffix}': F(f'accuracy_sum_{suffix}') + sum(session.accuracy for session in group),
+                best_accuracy_field: Case(
+                    When(
+                        cls._beaten(best_accuracy_field, best_accuracy),
+                        then=Value(best_accuracy, output_field=models.FloatField()),
+                    ),
+                    default=F(best_accuracy_field),
+                ),
+            })
+        
+        new_records = []
+        with transaction.atomic():
+            stats = cls.objects.filter(user_id=user_id)
+            if not stats.update(**changes):
+                cls.objects.get_or_create(user_id=user_id)
+                stats.update(**changes)
             
-            self.total_time_typed += int(session.typing_time)
-            self.last_test_at = session.completed_at
+            # A personal record is the row count of a conditional UPDATE
+            for duration, group in by_duration.items():
+                best_wpm_field = f'best_wpm_{duration}s'
+                best_wpm = max(session.wpm for session in group)
+                if stats.filter(cls._beaten(best_wpm_field, best_wpm)).update(**{best_wpm_field: best_wpm}):
+                    new_records.append(duration)
         
-        self.completion_rate = (self.completed_tests / self.total_tests * 100) if self.total_tests > 0 else 0
-        self.save()
+        return new_records
+    
+    @classmethod
+    def beats_personal_best(cls, session):
+        """Read-only personal record check for a session not yet folded into stats"""
+        if session.duration not in cls.DURATIONS:
+            return False
+        best = cls.objects.filter(user_id=session.user_id).values_list(
+            f'best_wpm_{session.duration}s', flat=True
+        ).first()
+        return best is None or session.wpm > best
+    
+    @staticmethod
+    def _beaten(field, value):
+        """Condition matching rows whose best `field` is unset or below `value`"""
+        return Q(**{f'{field}__isnull': True}) | Q(**{f'{field}__lt': value})
 
 
 class TextContent(models.Model):
@@ -0,0 +1,71 @@
+"""
+Server-side replay of keystroke logs.
+
+``replay`` rebuilds the text a client ended up with from its keystroke log,
+applying backspaces and the engine's rule that nothing is typed past the end
+of the prompt, and measures the elapsed time. ``verify_result`` checks a
+completion's claimed text and time against the replay so metrics are
+computed from what was actually typed. Both are single passes over the log;
+logs without backspaces take a C-level fast path.
+"""
+from collections import namedtuple
+
+from .keystrokes import KEY_BACKSPACE
+
+# Seconds of slack between the log's last keystroke and the claimed time
+TIME_TOLERANCE = 0.5
+# Seconds a log may run past the test duration (timer and event jitter)
+DURATION_GRACE = 2.0
+
+ReplayResult = namedtuple('ReplayResult', ['typed_text', 'elapsed', 'keystrokes', 'backspaces'])
+
+
+class ReplayMismatch(ValueError):
+    """Raised when a claimed result does not match its keystroke log"""
+
+
+def replay(keystrokes, max_length=None):
+    """Return a ReplayResult for a decoded log (see typing_test.keystrokes)"""
+    keys = keystrokes.keys
+    elapsed = keystrokes.times[-1] / 1000 if len(keystrokes.times) else 0.0
+
+    if KEY_BACKSPACE not in keys:
+        if keys.typecode == 'B':
+            # Code points below 256 decode one-to-one as Latin-1
+            typed = keys.tobytes().decode('latin-1')
+        else:
+            typed = ''.join(map(chr, keys))
+        if max_length is not None:
+            typed = typed[:max_length]
+        return ReplayResult(typed, elapsed, len(keys), 0)
+
+    typed = []
+    backspaces = 0
+    limit = len(keys) if max_length is None else max_length
+    for code in keys:
+        if code == KEY_BACKSPACE:
+            if typed:
+                typed.pop()
+            backspaces += 1
+        elif len(typed) < limit:
+            typed.append(chr(code))
+    return ReplayResult(''.join(typed), elapsed, len(keys), backspaces)
+
+
+def verify_result(keystrokes, prompt, duration, typed_text, actual_time):
+    """
+    Replay a log against a completion's claims.
+
+    Returns ``(typed_text, typing_time)`` to score the session with; raises
+    ReplayMismatch if the claimed text differs from the replay, the claimed
+    time is shorter than the keystrokes took, or the log overran the test.
+    """
+    result = replay(keystrokes, max_length=len(prompt))
+    if result.typed_text != typed_text:
+        raise ReplayMismatch('Typed text does not match keystroke log')
+    if result.elapsed > duration + DURATION_GRACE:
+        raise ReplayMismatch('Keystroke log is longer than the test')
+    if actual_time + TIME_TOLERANCE < result.elapsed:
+        raise ReplayMismatch('Reported time is shorter than the keystroke log')
+    # A timed-out test ends after its last keystroke, so the claim may be longer
+    return result.typed_text, max(actual_time, result.elapsed)
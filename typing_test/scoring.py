@@ -0,0 +1,253 @@
+"""
+Word-aligned scoring of typed text against its prompt.
+
+Comparing by position turns one skipped or doubled character into an error
+on every following character. ``score_text`` instead aligns the typed words
+to the prompt's words with a banded edit distance, then aligns the
+characters inside each mismatched word pair the same way, and counts:
+
+- correct: typed characters that match the prompt
+- incorrect: typed characters in place of a different prompt character
+- extra: typed characters with no prompt counterpart
+- missed: prompt characters skipped inside the typed span
+
+Prompt text after the last word reached is untyped, not missed, and the word
+being typed when the test ended is compared as a prefix. Tabs and line
+breaks are typed with the space bar, so all whitespace counts as a space.
+
+Each alignment only considers cells within ``band`` of the diagonal, and
+typed input running further than ``band`` past the end of the prompt is
+counted as extra without being aligned, so scoring is O(n * k) for n prompt
+words and a band of k however much is typed. Words typed correctly are
+matched directly and the alignment only runs over the stretch between a
+mistake and the point where the typed words agree with the prompt again;
+input that typed its prompt exactly returns after one ``str.startswith``.
+"""
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# Words a typist may drift from the prompt (skipped or extra words)
+WORD_BAND = 8
+# Characters a single word may drift from its prompt word
+CHAR_BAND = 8
+
+# Word offsets tried after a mistake, cheapest gap first: each unpaired word
+# costs about twice what a misspelt word does, then nearest first
+_RESYNC_OFFSETS = sorted(
+    ((a, b) for a in range(WORD_BAND + 1) for b in range(WORD_BAND + 1) if a or b),
+    key=lambda offset: (2 * abs(offset[0] - offset[1]) + min(offset), sum(offset)),
+)
+
+# Whitespace other than a plain space
+_OTHER_WHITESPACE = re.compile(r'[^\S ]')
+
+MATCH, SUBSTITUTE, EXTRA, MISSED = 'match', 'substitute', 'extra', 'missed'
+
+Score = namedtuple('Score', ['correct', 'incorrect', 'extra', 'missed'])
+
+
+def _tokens(text):
+    """Split text into words, each keeping the space that follows it"""
+    words = text.split(' ')
+    tokens = [word + ' ' for word in words[:-1]]
+    if words[-1]:
+        tokens.append(words[-1])
+    return tokens
+
+
+def _align(typed, prompt, band, substitute_cost=None, open_end=False, prefix_last=False):
+    """
+    Banded edit-distance alignment of two sequences.
+
+    Returns the operations as ``(op, typed index, prompt index)`` in order.
+    Extra and missed items cost 1; a substitution costs 1 or
+    ``substitute_cost(typed item, prompt item)``. With ``open_end`` the
+    alignment may stop before the end of ``prompt`` (the rest was never
+    reached). Items more than ``band`` past the end of the other sequence are
+    never aligned: trailing typed items are extra and, with a closed end,
+    trailing prompt items are missed. With ``prefix_last`` the last typed item
+    matches any prompt item it is a prefix of, and calling it extra costs 2
+    like an interior item (an extra one plus the prompt item it displaced)
+    rather than 1 plus nothing for the untyped rest.
+    """
+    rows, cols = len(typed), len(prompt)
+    # No path strays further from the diagonal than the longer side
+    band = min(band, max(rows, cols))
+    # Cut what the band cannot reach so the ends stay inside it
+    excess_typed = max(0, rows - cols - band)
+    excess_prompt = 0 if open_end else max(0, cols - rows - band)
+    rows -= excess_typed
+    cols -= excess_prompt
+    prefix_last = prefix_last and not excess_typed
+    width = 2 * band + 1
+    infinity = float('inf')
+
+    # cost[i][j - i + band] is the cheapest alignment of typed[:i] to prompt[:j]
+    cost = [[infinity] * width for _ in range(rows + 1)]
+    back = [[None] * width for _ in range(rows + 1)]
+    for j in range(min(cols, band) + 1):
+        cost[0][j + band] = j
+        back[0][j + band] = MISSED
+
+    for i in range(1, rows + 1):
+        above, row, row_back = cost[i - 1], cost[i], back[i]
+        item = typed[i - 1]
+        prefix = prefix_last and i == rows
+        extra_cost = 2 if prefix else 1
+        for j in range(max(0, i - band), min(cols, i + band) + 1):
+            k = j - i + band
+            # Diagonal (match or substitute) is preferred on ties, then missed, then extra
+            best, op = infinity, None
+            if j:
+                same = item == prompt[j - 1] or prefix and prompt[j - 1].startswith(item)
+                if same:
+                    best = above[k]
+                elif substitute_cost:
+                    # An unfinished item is compared with as much of the prompt item as it covers
+                    target = prompt[j - 1][:len(item)] if prefix else prompt[j - 1]
+                    best = above[k] + substitute_cost(item, target)
+                else:
+                    best = above[k] + 1
+                op = MATCH if same else SUBSTITUTE
+                if k and row[k - 1] + 1 < best:
+                    best, op = row[k - 1] + 1, MISSED
+            if k + 1 < width and above[k + 1] + extra_cost < best:
+                best, op = above[k + 1] + extra_cost, EXTRA
+            row[k], row_back[k] = best, op
+
+    if open_end:
+        # Cheapest end point; ties go to the one furthest into the prompt
+        candidates = range(max(0, rows - band), min(cols, rows + band) + 1)
+        j = min(candidates, key=lambda j: (cost[rows][j - rows + band], -j))
+    else:
+        j = cols
+
+    ops = []
+    i = rows
+    while i or j:
+        op = back[i][j - i + band]
+        if op == EXTRA:
+            i -= 1
+            ops.append((op, i, None))
+        elif op == MISSED:
+            j -= 1
+            ops.append((op, None, j))
+        else:
+            i -= 1
+            j -= 1
+            ops.append((op, i, j))
+    ops.reverse()
+    ops.extend((EXTRA, i, None) for i in range(rows, rows + excess_typed))
+    ops.extend((MISSED, None, j) for j in range(cols, cols + excess_prompt))
+    return ops
+
+
+@lru_cache(maxsize=4096)
+def _word_substitute_cost(typed, prompt):
+    """
+    From near 0 for a one-letter typo in a long word up to 2 (as unlikely as
+    an extra word plus a skipped one) for words with nothing in common. A
+    flat cost would make a trailing misspelt word cheaper to call extra than
+    to compare with the prompt word it was meant to be.
+    """
+    shortest = min(len(typed), len(prompt))
+    head = 0
+    while head < shortest and typed[head] == prompt[head]:
+        head += 1
+    tail = 0
+    while tail < shortest - head and typed[-1 - tail] == prompt[-1 - tail]:
+        tail += 1
+    # Letters in place counted from either end catch scattered typos the common affixes miss
+    shared = max(
+        head + tail,
+        sum(a == b for a, b in zip(typed, prompt)),
+        sum(a == b for a, b in zip(reversed(typed), reversed(prompt))),
+    )
+    return 2 * (1 - shared / max(len(typed), len(prompt)))
+
+
+def _score_word(typed, prompt, partial, counts):
+    """Add the character counts for one typed word aligned to a different prompt word"""
+    if partial:
+        # The unfinished word is compared with as much of its prompt word as was typed
+        prompt = prompt[:len(typed)]
+    # Typos are usually one or two characters, so only the middle needs aligning
+    head = 0
+    while head < len(typed) and head < len(prompt) and typed[head] == prompt[head]:
+        head += 1
+    tail = 0
+    while tail < len(typed) - head and tail < len(prompt) - head and typed[-1 - tail] == prompt[-1 - tail]:
+        tail += 1
+    counts[MATCH] += head + tail
+    for op, _, _ in _align(typed[head:len(typed) - tail], prompt[head:len(prompt) - tail], CHAR_BAND):
+        counts[op] += 1
+
+
+def _resync(typed, prompt, i, j):
+    """
+    Nearest ``(a, b)`` past a mismatch at ``(i, j)`` where the words agree
+    again, searched within ``WORD_BAND``; None if there is none. Two agreeing
+    words are preferred, one will do where mistakes are dense.
+    """
+    for span in (2, 1):
+        for skip_typed, skip_prompt in _RESYNC_OFFSETS:
+            a, b = i + skip_typed, j + skip_prompt
+            if a + span <= len(typed) and typed[a:a + span] == prompt[b:b + span]:
+                return a, b
+    return None
+
+
+def score_text(prompt, typed):
+    """Return a Score for ``typed`` against ``prompt``"""
+    if prompt.startswith(typed):
+        return Score(len(typed), 0, 0, 0)
+
+    prompt = _OTHER_WHITESPACE.sub(' ', prompt)
+    typed = _OTHER_WHITESPACE.sub(' ', typed)
+    if prompt.startswith(typed):
+        return Score(len(typed), 0, 0, 0)
+
+    typed_words = _tokens(typed)
+    prompt_words = _tokens(prompt)
+    in_progress = not typed.endswith(' ')
+    last = len(typed_words) - 1
+    counts = dict.fromkeys([MATCH, SUBSTITUTE, EXTRA, MISSED], 0)
+
+    def apply(ops, i, j):
+        for op, a, b in ops:
+            if op == MATCH:
+                counts[MATCH] += len(typed_words[i + a])
+            elif op == EXTRA:
+                counts[EXTRA] += len(typed_words[i + a])
+            elif op == MISSED:
+                counts[MISSED] += len(prompt_words[j + b])
+            else:
+                _score_word(typed_words[i + a], prompt_words[j + b], in_progress and i + a == last, counts)
+
+    # Walk matching words directly and only align the stretches around mistakes
+    i = j = 0
+    while i <= last:
+        if j < len(prompt_words) and (
+            typed_words[i] == prompt_words[j]
+            or in_progress and i == last and prompt_words[j].startswith(typed_words[i])
+        ):
+            counts[MATCH] += len(typed_words[i])
+            i += 1
+            j += 1
+            continue
+
+        sync = _resync(typed_words, prompt_words, i, j)
+        if sync is None:
+            # No agreement ahead: align the rest, stopping wherever the typist did
+            rest = _align(
+                typed_words[i:], prompt_words[j:j + last + 1 - i + WORD_BAND], WORD_BAND,
+                substitute_cost=_word_substitute_cost, open_end=True, prefix_last=in_progress,
+            )
+            apply(rest, i, j)
+            break
+        a, b = sync
+        apply(_align(typed_words[i:a], prompt_words[j:b], WORD_BAND, substitute_cost=_word_substitute_cost), i, j)
+        i, j = a, b
+
+    return Score(counts[MATCH], counts[SUBSTITUTE], counts[EXTRA], counts[MISSED])
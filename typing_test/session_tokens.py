@@ -0,0 +1,111 @@
+"""
+Stateless signed test-session tokens.
+
+When ``TYPING_SIGNED_SESSIONS`` is enabled, starting a test writes nothing to
+the database. The start endpoint returns an HMAC-signed token describing the
+test instead, and the complete endpoint verifies it and inserts a single
+``TestSession`` row.
+"""
+import secrets
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+
+from .corpus import corpus_index
+from .generator import generate_text
+from .models import TextContent
+
+TOKEN_SALT = 'typing_test.session_token'
+USED_TOKEN_CACHE_PREFIX = 'typing_test:used_token:'
+
+
+class SessionTokenError(Exception):
+    """Raised when a session token cannot be used to complete a test"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def get_token_max_age():
+    return getattr(settings, 'TYPING_SESSION_TOKEN_MAX_AGE', 60 * 60)
+
+
+def session_owner(request):
+    """Identify the user or guest session a token belongs to"""
+    if request.user.is_authenticated:
+        return f'u:{request.user.pk}'
+    return f's:{request.session.session_key or ""}'
+
+
+def issue_session_token(request, duration, text_content, text_id=None, prompt_ref=None):
+    """Sign a token holding the text reference, duration, owner and issue time"""
+    payload = {
+        'd': duration,
+        'o': session_owner(request),
+        'iat': int(time.time()),
+        'n': secrets.token_hex(8),
+    }
+
+    # Generated texts travel as their prompt reference, corpus texts by id and
+    # word count, anything else is embedded
+    entry = corpus_index.get(text_id) if text_id else None
+    words = text_content.split()
+    if prompt_ref:
+        payload['g'] = prompt_ref
+    elif entry and tuple(words) == entry.words[:len(words)]:
+        payload['t'] = entry.id
+        payload['w'] = len(words)
+    else:
+        payload['x'] = text_content
+
+    return signing.dumps(payload, salt=TOKEN_SALT, compress=True)
+
+
+def read_session_token(request, token):
+    """
+    Verify a token and return ``(text_content, duration, started_at_epoch,
+    prompt_ref)``; prompt_ref is None unless the text was generated.
+
+    Each token can be completed once; replays raise SessionTokenError.
+    """
+    max_age = get_token_max_age()
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT, max_age=max_age)
+    except signing.SignatureExpired:
+        raise SessionTokenError('Session token expired')
+    except signing.BadSignature:
+        raise SessionTokenError('Invalid session token')
+
+    if payload.get('o') != session_owner(request):
+        raise SessionTokenError('Unauthorized', status=403)
+
+    if 'g' in payload:
+        text_content = generate_text(payload['g'])
+    elif 't' in payload:
+        text_content = resolve_text_reference(payload['t'], payload['w'])
+        if text_content is None:
+            raise SessionTokenError('Text no longer available')
+    else:
+        text_content = payload['x']
+
+    if not cache.add(USED_TOKEN_CACHE_PREFIX + payload['n'], 1, max_age):
+        raise SessionTokenError('Session already completed', status=409)
+
+    return text_content, payload['d'], payload['iat'], payload.get('g')
+
+
+def resolve_text_reference(text_id, word_count):
+    """Rebuild the prompt for a (text id, word count) reference"""
+    entry = corpus_index.get(text_id)
+    if entry:
+        words = entry.words
+    else:
+        # Deactivated since the token was issued
+        content = TextContent.objects.filter(id=text_id).values_list('content', flat=True).first()
+        if content is None:
+            return None
+        words = content.split()
+    return ' '.join(words[:word_count])
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import TextContent
+from .corpus import bump_corpus_generation
+
+
+@receiver(post_save, sender=TextContent)
+@receiver(post_delete, sender=TextContent)
+def text_content_changed(sender, **kwargs):
+    """Rebuild corpus indexes after any TextContent change"""
+    bump_corpus_generation()
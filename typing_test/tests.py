@@ -1,3 +1,313 @@
-from django.test import TestCase
+import base64
+import json
+import time
+import tracemalloc
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import User
+
+from .completion import CompletionError, verify_completion
+from .generator import MAX_WORDS, canonical_prompt_ref, generate_text, make_prompt_ref, parse_prompt_ref
+from .keystrokes import KEY_BACKSPACE, KeystrokeLogError, decode_base64_log, decode_log, encode_log
+from .models import TestSession, UserStats
+from .replay import ReplayMismatch, replay, verify_result
+from .scoring import Score, score_text
+
+
+def encode_typing(text, step=100):
+    """Base64 log for typing ``text`` at one key per ``step`` ms, with '<' as Backspace"""
+    keys = [KEY_BACKSPACE if char == '<' else ord(char) for char in text]
+    times = [step * n for n in range(len(keys))]
+    return base64.b64encode(encode_log(times, keys, [0] * len(keys))).decode()
+
+
+class ScoreTextTests(SimpleTestCase):
+    def test_exact_prefix_is_all_correct(self):
+        self.assertEqual(score_text('the quick brown fox', 'the quick br'), Score(12, 0, 0, 0))
+
+    def test_skipped_character_only_costs_itself(self):
+        self.assertEqual(score_text('the quick brown fox', 'the quck brown'), Score(14, 0, 0, 1))
+
+    def test_doubled_character_is_extra(self):
+        self.assertEqual(score_text('the quick brown fox', 'the quiick brown'), Score(15, 0, 1, 0))
+
+    def test_skipped_word_is_missed(self):
+        self.assertEqual(score_text('the quick brown fox', 'the brown fox'), Score(13, 0, 0, 6))
+
+    def test_transposed_final_word_is_substitutions(self):
+        self.assertEqual(score_text('dog', 'dgo'), Score(1, 2, 0, 0))
+
+    def test_other_whitespace_counts_as_a_space(self):
+        self.assertEqual(score_text('hello\nworld\tagain', 'hello world again'), Score(17, 0, 0, 0))
+
+    def test_every_typed_character_is_counted_once(self):
+        for prompt, typed in [
+            ('the quick brown fox', 'teh quikc brwn fox jumps'),
+            ('a b c', 'a  b   c    '),
+            ('', 'abc'),
+            ('abc', ''),
+        ]:
+            with self.subTest(typed=typed):
+                score = score_text(prompt, typed)
+                self.assertEqual(score.correct + score.incorrect + score.extra, len(typed))
+
+    def test_text_typed_past_the_prompt_is_extra(self):
+        prompt = 'the quick brown fox'
+        self.assertEqual(score_text(prompt, prompt + ' jumps over'), Score(19, 0, 11, 0))
+
+    def test_oversized_input_is_scored_in_bounded_time_and_memory(self):
+        prompt = ' '.join(['lorem', 'ipsum', 'dolor', 'sit', 'amet'] * 24)
+        inputs = [
+            ' '.join(['amet', 'lorem', 'dolor', 'xyz'] * 3000),
+            'x' * 100_000,
+        ]
+        for typed in inputs:
+            with self.subTest(length=len(typed)):
+                tracemalloc.start()
+                started = time.perf_counter()
+                try:
+                    score = score_text(prompt, typed)
+                    elapsed = time.perf_counter() - started
+                    _, peak = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+                self.assertEqual(score.correct + score.incorrect + score.extra, len(typed))
+                self.assertLess(elapsed, 1.0)
+                self.assertLess(peak, 50 * 1024 * 1024)
+
+
+class KeystrokeCodecTests(SimpleTestCase):
+    def test_round_trip_keeps_every_column(self):
+        times, keys, holds = [0, 120, 250, 70000], [104, 0x1F600, KEY_BACKSPACE, 105], [80, 0, 300, 90]
+        decoded = decode_log(encode_log(times, keys, holds))
+        self.assertEqual((list(decoded.times), list(decoded.keys), list(decoded.holds)), (times, keys, holds))
+
+    def test_columns_use_the_narrowest_width(self):
+        self.assertEqual(len(encode_log([0, 1], [97, 98], [0, 0])), 7 + 3 * (1 + 2))
+
+    def test_malformed_logs_are_rejected(self):
+        log = encode_log([0, 100], [97, 98], [0, 0])
+        for label, data in [
+            ('magic', b'XX' + log[2:]),
+            ('version', log[:2] + bytes([9]) + log[3:]),
+            ('truncated', log[:-1]),
+            ('trailing', log + b'\0'),
+            ('width', log[:7] + bytes([3]) + log[8:]),
+        ]:
+            with self.subTest(label):
+                with self.assertRaises(KeystrokeLogError):
+                    decode_log(data)
+
+    def test_key_codes_outside_unicode_scalar_values_are_rejected(self):
+        for code in [0x110000, 0xFFFFFFFF, 0xD800, 0xDFFF]:
+            with self.subTest(code=hex(code)):
+                with self.assertRaises(KeystrokeLogError):
+                    decode_log(encode_log([0], [code], [0]))
+
+    def test_base64_errors_are_log_errors(self):
+        for encoded in ['not base64!', None, 'A' * 1_000_000]:
+            with self.subTest(encoded=str(encoded)[:20]):
+                with self.assertRaises(KeystrokeLogError):
+                    decode_base64_log(encoded)
+
+
+class ReplayTests(SimpleTestCase):
+    def keystrokes(self, text, step=100):
+        return decode_base64_log(encode_typing(text, step))[1]
+
+    def test_backspaces_are_applied(self):
+        result = replay(self.keystrokes('onx<e'))
+        self.assertEqual((result.typed_text, result.keystrokes, result.backspaces), ('one', 5, 1))
+        self.assertEqual(result.elapsed, 0.4)
+
+    def test_nothing_is_typed_past_the_prompt(self):
+        self.assertEqual(replay(self.keystrokes('abcdef'), max_length=3).typed_text, 'abc')
+        self.assertEqual(replay(self.keystrokes('abcd<ef'), max_length=3).typed_text, 'abe')
+
+    def test_wide_key_codes_replay(self):
+        self.assertEqual(replay(self.keystrokes('caf\u00e9 \U0001F600')).typed_text, 'caf\u00e9 \U0001F600')
+
+    def test_claims_must_match_the_log(self):
+        keystrokes = self.keystrokes('one', step=1500)
+        self.assertEqual(verify_result(keystrokes, 'one two', 15, 'one', 3.0), ('one', 3.0))
+        for typed, duration, actual_time in [('onf', 15, 3.0), ('one', 15, 0.5), ('one', 0, 3.0)]:
+            with self.subTest(typed=typed, actual_time=actual_time):
+                with self.assertRaises(ReplayMismatch):
+                    verify_result(keystrokes, 'one two', duration, typed, actual_time)
+
+    def test_verify_completion_reports_bad_logs_as_completion_errors(self):
+        out_of_range = base64.b64encode(encode_log([0], [0x110000], [0])).decode()
+        for encoded in [out_of_range, 'garbage!', encode_typing('onf')]:
+            with self.subTest(encoded=encoded):
+                with self.assertRaises(CompletionError):
+                    verify_completion(encoded, 'one two', 15, 'one', 3.0)
+
+    @override_settings(TYPING_REQUIRE_KEYSTROKE_LOG=True)
+    def test_log_is_required_when_configured(self):
+        with self.assertRaises(CompletionError):
+            verify_completion(None, 'one two', 15, 'one', 3.0)
+
+
+@override_settings(RATELIMIT_ENABLE=False)
+class CompletionEndpointTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('typist', 'typist@example.com', 'Passw0rdX')
+        self.client.force_login(self.user)
+
+    def post(self, path, data):
+        return self.client.post(path, json.dumps(data), content_type='application/json')
+
+    def test_invalid_key_code_is_a_client_error(self):
+        session_id = self.post('/typing/api/start/', {'duration': 15, 'text_content': 'one two'}).json()['session_id']
+        log = base64.b64encode(encode_log([0, 100], [0x110000, 0xD800], [0, 0])).decode()
+        response = self.post('/typing/api/complete/', {
+            'session_id': session_id, 'typed_text': 'on', 'actual_time': 3, 'keystroke_log': log,
+        })
+        self.assertEqual(response.status_code, 400)
+
+    def test_unusable_prompt_references_are_client_errors(self):
+        for prompt_ref in [['g1:easy:5:0'], {'g': 1}, 'g1:easy:+5:0']:
+            with self.subTest(prompt_ref=prompt_ref):
+                response = self.post('/typing/api/start/', {'duration': 15, 'prompt_ref': prompt_ref})
+                self.assertEqual(response.status_code, 400)
+
+    def test_batch_rejects_only_items_with_unusable_prompt_references(self):
+        items = [
+            {
+                'idempotency_key': str(index), 'duration': 15, 'prompt_ref': prompt_ref, 'typed_text': 'the',
+                'actual_time': 3, 'completed_at': int(time.time() * 1000),
+            }
+            for index, prompt_ref in enumerate([['g1:easy:5:0'], {'g': 1}, 'g1:easy:005:0', 'g1:easy:5:0'])
+        ]
+        response = self.post('/api/batch-update/', {'sessions': items})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([rejected['index'] for rejected in response.json()['rejected']], [0, 1, 2])
+        self.assertEqual(list(TestSession.objects.values_list('prompt_ref', flat=True)), ['g1:easy:5:0'])
+
+    def test_batch_rejects_only_the_item_with_a_bad_log(self):
+        def item(key, log):
+            return {
+                'idempotency_key': key, 'duration': 15, 'text_content': 'one two', 'typed_text': 'one',
+                'actual_time': 3, 'completed_at': int(time.time() * 1000), 'keystroke_log': log,
+            }
+
+        bad_log = base64.b64encode(encode_log([0, 100, 200], [0x110000, 110, 101], [0, 0, 0])).decode()
+        response = self.post('/api/batch-update/', {'sessions': [item('bad', bad_log), item('good', encode_typing('one'))]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([rejected['index'] for rejected in response.json()['rejected']], [0])
+        self.assertEqual(list(TestSession.objects.values_list('idempotency_key', flat=True)), ['good'])
+
+
+class PromptGeneratorTests(SimpleTestCase):
+    def test_reference_regenerates_the_same_text(self):
+        ref = make_prompt_ref('medium', 40, seed=12345)
+        self.assertEqual(generate_text(ref), generate_text(ref))
+        self.assertEqual(len(generate_text(ref).split(' ')), 40)
+        self.assertNotEqual(generate_text(ref), generate_text(make_prompt_ref('medium', 40, seed=12346)))
+
+    def test_published_word_list_is_unchanged(self):
+        self.assertEqual(generate_text('g1:easy:5:0'), 'much the when are that')
+
+    def test_canonical_reference_round_trips(self):
+        ref = make_prompt_ref('hard', MAX_WORDS, seed=(1 << 64) - 1)
+        self.assertEqual(canonical_prompt_ref(ref), ref)
+        self.assertLessEqual(len(ref), 40)
+
+    def test_invalid_references_are_value_errors(self):
+        for ref in [
+            None, 5, ['g1:easy:5:0'], {'ref': 'g1:easy:5:0'},
+            '', 'g1:easy:5', 'x1:easy:5:0', 'g1:easy:5:0:1', 'g2:easy:5:0', 'g1:impossible:5:0',
+            'g1:easy:0:0', f'g1:easy:{MAX_WORDS + 1}:0', f'g1:easy:5:{1 << 64}',
+            'g1:easy:+5:0', 'g1:easy:5:1_000', 'g1:easy:05:0', 'g01:easy:5:0', 'g1:easy: 5:0', 'g1:easy:\u0665:0',
+        ]:
+            with self.subTest(ref=ref):
+                with self.assertRaises(ValueError):
+                    parse_prompt_ref(ref)
+                with self.assertRaises(ValueError):
+                    generate_text(ref)
+
+
+class RecordSessionsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('typist', 'typist@example.com', 'Passw0rdX')
+
+    def record(self, completed_at, wpm=50.0, duration=30):
+        session = TestSession(
+            user=self.user, duration=duration, wpm=wpm, accuracy=95.0, typing_time=duration,
+            completed=True, completed_at=completed_at,
+        )
+        return UserStats.record_sessions(self.user.id, [session])
+
+    def test_counters_and_records(self):
+        now = timezone.now()
+        self.assertEqual(self.record(now, wpm=50.0), [30])
+        self.assertEqual(self.record(now, wpm=40.0), [])
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.completed_tests, stats.completed_tests_30s, stats.best_wpm_30s), (2, 2, 50.0))
+        self.assertEqual(stats.avg_wpm, 45.0)
+
+    def test_older_upload_does_not_move_last_test_back(self):
+        now = timezone.now()
+        self.record(now)
+        self.record(now - timedelta(days=3))
+        self.assertEqual(UserStats.objects.get(user=self.user).last_test_at, now)
+        self.record(now + timedelta(minutes=1))
+        self.assertEqual(UserStats.objects.get(user=self.user).last_test_at, now + timedelta(minutes=1))
+
+
+@override_settings(TYPING_SIGNED_SESSIONS=True, RATELIMIT_ENABLE=False)
+class SignedSessionTokenTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('typist', 'typist@example.com', 'Passw0rdX')
+        self.client.force_login(self.user)
+
+    def post(self, path, data):
+        return self.client.post(path, json.dumps(data), content_type='application/json')
+
+    def start(self, **data):
+        response = self.post('/typing/api/start/', {'duration': 15, **data})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['session_id'])
+        return response.json()['session_token']
+
+    def complete(self, token):
+        return self.post('/typing/api/complete/', {'session_token': token, 'typed_text': 'one', 'actual_time': 3})
+
+    def test_start_writes_nothing_and_completion_writes_one_row(self):
+        token = self.start(text_content='one two three')
+        self.assertFalse(TestSession.objects.exists())
+        self.assertEqual(self.complete(token).status_code, 200)
+        session = TestSession.objects.get()
+        self.assertEqual((session.user, session.duration, session.prompt), (self.user, 15, 'one two three'))
+
+    def test_generated_prompt_travels_as_its_reference(self):
+        ref = make_prompt_ref('easy', 10, seed=7)
+        token = self.start(prompt_ref=ref)
+        self.post('/typing/api/complete/', {'session_token': token, 'typed_text': '', 'actual_time': 3})
+        self.assertEqual(TestSession.objects.get().prompt_ref, ref)
+
+    def test_token_completes_once(self):
+        token = self.start(text_content='one two three')
+        self.assertEqual(self.complete(token).status_code, 200)
+        self.assertEqual(self.complete(token).status_code, 409)
+        self.assertEqual(TestSession.objects.count(), 1)
+
+    def test_tampered_token_is_rejected(self):
+        token = self.start(text_content='one two three')
+        self.assertEqual(self.complete(token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB')).status_code, 400)
+
+    def test_token_belongs_to_its_owner(self):
+        token = self.start(text_content='one two three')
+        self.client.force_login(User.objects.create_user('other', 'other@example.com', 'Passw0rdX'))
+        self.assertEqual(self.complete(token).status_code, 403)
+
+    def test_expired_token_is_rejected(self):
+        token = self.start(text_content='one two three')
+        with override_settings(TYPING_SESSION_TOKEN_MAX_AGE=-1):
+            response = self.complete(token)
+        self.assertEqual((response.status_code, response.json()['error']), (400, 'Session token expired'))
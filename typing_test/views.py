@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
@@ -5,10 +6,25 @@ from django.views.decorators.csrf import csrf_protect
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 from django.core.cache import cache
+from datetime import datetime, timezone as dt_timezone
 import json
-import random
-from .models import TestSession, UserStats, TextContent
+from .models import TestSession, UserStats, SessionText
+from .completion import verify_completion, store_keystroke_logs, CompletionError
+from .scoring import score_text
+from .corpus import corpus_index
+from .generator import canonical_prompt_ref, generate_text, make_prompt_ref, WORD_LISTS, CURRENT_VERSION
+from .session_tokens import issue_session_token, read_session_token, SessionTokenError
+from .batch import ingest_batch, update_boards, MAX_BATCH_SIZE
+from .write_behind import write_buffer
+from jobs.queue import enqueue
 from accounts.models import User
+from leaderboard.models import LeaderboardEntry
+from leaderboard.ranks import rank_service
+from leaderboard.board_cache import invalidate_boards
+from leaderboard.jobs import enqueue_rerank
+
+# Client-reported events kept per session
+MAX_SUSPICIOUS_EVENTS = 50
 
 
 def home_view(request):
@@ -40,26 +56,28 @@ def get_test_text(request):
     """
     duration = int(request.GET.get('duration', 30))
     difficulty = request.GET.get('difficulty', 'medium')
-    
-    # Try to get from database first
-    text_content = TextContent.objects.filter(
-        difficulty=difficulty,
-        is_active=True
-    ).order_by('?').first()
-    
-    if text_content:
-        content = text_content.content
+    language = request.GET.get('language', 'en')
+    category = request.GET.get('category') or None
+
+    # Pick from the in-memory corpus index (no DB query once warm)
+    entry = corpus_index.pick(difficulty, language=language, category=category)
+
+    prompt_ref = None
+    if entry:
+        text_id = entry.id
         # Adjust content length based on duration
-        words = content.split()
         target_words = duration * 2  # Rough estimate: 2 words per second for average typing
-        if len(words) > target_words:
-            content = ' '.join(words[:target_words])
+        content = ' '.join(entry.words[:target_words])
     else:
-        # Fallback: generate text client-side style
-        content = generate_fallback_text(difficulty, duration)
-    
+        # Fallback: seeded generated text, identified by its prompt reference
+        text_id = None
+        prompt_ref = make_fallback_prompt_ref(difficulty, duration)
+        content = generate_text(prompt_ref)
+
     return JsonResponse({
         'text': content,
+        'text_id': text_id,
+        'prompt_ref': prompt_ref,
         'word_count': len(content.split()),
         'character_count': len(content),
         'difficulty': difficulty,
@@ -75,18 +93,46 @@ def start_test_session(request):
     """
     try:
         data = json.loads(request.body)
-        duration = int(data.get('duration', 30))
+        try:
+            duration = int(data.get('duration', 30))
+        except (TypeError, ValueError):
+            duration = None
+        if duration not in dict(TestSession.DURATION_CHOICES):
+            return JsonResponse({'error': 'Invalid duration'}, status=400)
         text_content = data.get('text_content', '')
+        prompt_ref = data.get('prompt_ref')
+        
+        # Generated prompts are sent as a reference and regenerated here
+        if prompt_ref:
+            try:
+                prompt_ref = canonical_prompt_ref(prompt_ref)
+                text_content = generate_text(prompt_ref)
+            except ValueError:
+                return JsonResponse({'error': 'Invalid prompt reference'}, status=400)
         
         if not text_content:
             return JsonResponse({'error': 'Text content required'}, status=400)
         
+        # Signed-token mode: nothing is written until the test is completed
+        if settings.TYPING_SIGNED_SESSIONS:
+            token = issue_session_token(
+                request, duration, text_content, text_id=data.get('text_id'), prompt_ref=prompt_ref
+            )
+            return JsonResponse({
+                'session_id': None,
+                'session_token': token,
+                'text': text_content,
+                'duration': duration,
+                'started_at': timezone.now().isoformat()
+            })
+        
         # Create test session
         session = TestSession.objects.create(
             user=request.user if request.user.is_authenticated else None,
             session_key=request.session.session_key if not request.user.is_authenticated else None,
             duration=duration,
-            text_content=text_content,
+            prompt_ref=prompt_ref,
+            text_id=None if prompt_ref else SessionText.intern(text_content),
             typed_text='',  # Will be updated when completed
             wpm=0,
             accuracy=0,
@@ -116,24 +162,53 @@ def complete_test_session(request):
     try:
         data = json.loads(request.body)
         session_id = data.get('session_id')
+        session_token = data.get('session_token')
         typed_text = data.get('typed_text', '')
         actual_time = float(data.get('actual_time', 0))
         focus_lost_count = int(data.get('focus_lost_count', 0))
         suspicious_events = data.get('suspicious_events', [])
+        if not isinstance(suspicious_events, list):
+            suspicious_events = []
+        suspicious_events = suspicious_events[:MAX_SUSPICIOUS_EVENTS]
         
-        # Get the session
-        session = get_object_or_404(TestSession, id=session_id)
-        
-        # Verify session ownership
-        if request.user.is_authenticated:
-            if session.user != request.user:
-                return JsonResponse({'error': 'Unauthorized'}, status=403)
+        if session_token:
+            # Signed-token mode: verify the token and build the row in memory
+            try:
+                text_content, duration, issued_at, prompt_ref = read_session_token(request, session_token)
+            except SessionTokenError as e:
+                return JsonResponse({'error': str(e)}, status=e.status)
+            
+            session = TestSession(
+                user=request.user if request.user.is_authenticated else None,
+                session_key=request.session.session_key if not request.user.is_authenticated else None,
+                duration=duration,
+                prompt_ref=prompt_ref,
+                text_id=None if prompt_ref else SessionText.intern(text_content),
+                started_at=datetime.fromtimestamp(issued_at, tz=dt_timezone.utc),
+            )
         else:
-            if session.session_key != request.session.session_key:
-                return JsonResponse({'error': 'Unauthorized'}, status=403)
+            # Get the session
+            session = get_object_or_404(TestSession, id=session_id)
+            
+            # Verify session ownership
+            if request.user.is_authenticated:
+                if session.user != request.user:
+                    return JsonResponse({'error': 'Unauthorized'}, status=403)
+            else:
+                if session.session_key != request.session.session_key:
+                    return JsonResponse({'error': 'Unauthorized'}, status=403)
+        
+        original_text = text_content if session_token else session.prompt
+        
+        # Score what the keystroke log proves was typed, not the client's claim
+        try:
+            typed_text, actual_time, keystroke_log = verify_completion(
+                data.get('keystroke_log'), original_text, session.duration, typed_text, actual_time
+            )
+        except CompletionError as e:
+            return JsonResponse({'error': str(e)}, status=400)
         
         # Calculate metrics
-        original_text = session.text_content
         metrics = calculate_typing_metrics(original_text, typed_text, actual_time)
         
         # Update session
@@ -143,19 +218,36 @@ def complete_test_session(request):
         session.typing_time = actual_time
         session.correct_chars = metrics['correct_chars']
         session.incorrect_chars = metrics['incorrect_chars']
+        session.extra_chars = metrics['extra_chars']
+        session.missed_chars = metrics['missed_chars']
         session.total_chars = metrics['total_chars']
         session.focus_lost_count = focus_lost_count
         session.suspicious_events = suspicious_events
         session.completed = True
         session.completed_at = timezone.now()
-        session.save()
+        session.composite_score = TestSession.calculate_composite_score(session.wpm, session.accuracy)
+        
+        session.pending_keystroke_log = keystroke_log
         
-        # Update user stats if authenticated
-        is_new_record = False
-        if request.user.is_authenticated:
-            user_stats, created = UserStats.objects.get_or_create(user=request.user)
-            is_new_record = check_personal_record(user_stats, session)
-            user_stats.update_stats_from_session(session)
+        # Write-behind mode: answer now and let the flusher write the session
+        if settings.TYPING_WRITE_BEHIND and write_buffer.submit(session):
+            is_new_record = request.user.is_authenticated and UserStats.beats_personal_best(session)
+        else:
+            session.save()
+            store_keystroke_logs([session])
+            
+            # Update user stats if authenticated
+            is_new_record = False
+            if request.user.is_authenticated and settings.TYPING_DEFERRED_FOLLOWUPS:
+                enqueue('typing_test.record_sessions', {'session_id': session.id})
+                is_new_record = UserStats.beats_personal_best(session)
+            elif request.user.is_authenticated:
+                is_new_record = UserStats.record_session(session)
+                changed_periods = LeaderboardEntry.record_session(session)
+                rank_service.record_session(session)
+                invalidate_boards(session.duration, changed_periods, session.composite_score)
+                for period in changed_periods:
+                    enqueue_rerank(session.duration, period)
         
         return JsonResponse({
             'success': True,
@@ -166,6 +258,8 @@ def complete_test_session(request):
                 'typing_time': session.typing_time,
                 'correct_chars': session.correct_chars,
                 'incorrect_chars': session.incorrect_chars,
+                'extra_chars': session.extra_chars,
+                'missed_chars': session.missed_chars,
                 'total_chars': session.total_chars,
             },
             'is_new_record': is_new_record,
@@ -178,6 +272,43 @@ def complete_test_session(request):
         return JsonResponse({'error': f'Failed to complete session: {str(e)}'}, status=500)
 
 
+@csrf_protect
+@require_http_methods(["POST"])
+def batch_upload_sessions(request):
+    """
+    Store results queued by a client while offline, in one request.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    items = data.get('sessions') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        return JsonResponse({'error': 'sessions must be a list'}, status=400)
+    if len(items) > MAX_BATCH_SIZE:
+        return JsonResponse({'error': f'At most {MAX_BATCH_SIZE} sessions per batch'}, status=400)
+    
+    created, duplicates, rejected = ingest_batch(request.user, items)
+    
+    # Leaderboards and ranks are updated once per batch as well
+    update_boards(created)
+    
+    return JsonResponse({
+        'success': True,
+        'processed': len(created),
+        'created': [
+            {'idempotency_key': s.idempotency_key, 'id': s.id, 'wpm': s.wpm, 'accuracy': s.accuracy}
+            for s in created
+        ],
+        'duplicates': duplicates,
+        'rejected': rejected,
+    })
+
+
 def calculate_typing_metrics(original_text, typed_text, time_seconds):
     """
     Calculate WPM, accuracy, and other typing metrics.
@@ -188,29 +319,19 @@ def calculate_typing_metrics(original_text, typed_text, time_seconds):
             'accuracy': 0,
             'correct_chars': 0,
             'incorrect_chars': 0,
+            'extra_chars': 0,
+            'missed_chars': 0,
             'total_chars': 0
         }
     
-    # Character-level analysis
-    correct_chars = 0
-    incorrect_chars = 0
+    # Character-level analysis, aligned word by word (see typing_test.scoring)
+    score = score_text(original_text, typed_text)
     total_chars = len(typed_text)
     
-    # Compare character by character
-    min_length = min(len(original_text), len(typed_text))
-    for i in range(min_length):
-        if original_text[i] == typed_text[i]:
-            correct_chars += 1
-        else:
-            incorrect_chars += 1
-    
-    # Count missing characters as incorrect
-    if len(typed_text) < len(original_text):
-        incorrect_chars += len(original_text) - len(typed_text)
-    
-    # Calculate accuracy
-    if len(original_text) > 0:
-        accuracy = (correct_chars / len(original_text)) * 100
+    # Calculate accuracy over the part of the prompt the user reached
+    attempted = score.correct + score.incorrect + score.extra + score.missed
+    if attempted > 0:
+        accuracy = (score.correct / attempted) * 100
     else:
         accuracy = 0
     
@@ -226,45 +347,20 @@ def calculate_typing_metrics(original_text, typed_text, time_seconds):
     return {
         'wpm': round(adjusted_wpm, 2),
         'accuracy': round(accuracy, 2),
-        'correct_chars': correct_chars,
-        'incorrect_chars': incorrect_chars,
+        'correct_chars': score.correct,
+        'incorrect_chars': score.incorrect,
+        'extra_chars': score.extra,
+        'missed_chars': score.missed,
         'total_chars': total_chars,
         'raw_wpm': round(wpm, 2)
     }
 
 
-def check_personal_record(user_stats, session):
-    """
-    Check if this session is a new personal record.
+def make_fallback_prompt_ref(difficulty='medium', duration=30):
     """
-    duration_field = f'best_wpm_{session.duration}s'
-    current_best = getattr(user_stats, duration_field, None)
-    
-    if current_best is None or session.wpm > current_best:
-        return True
-    
-    return False
-
-
-def generate_fallback_text(difficulty='medium', duration=30):
+    Reference for a generated fallback prompt (see typing_test.generator).
     """
-    Generate text content for typing tests as fallback.
-    """
-    word_lists = {
-        'easy': ['the', 'and', 'for', 'you', 'are', 'with', 'this', 'that', 'have', 'from', 
-                'they', 'know', 'want', 'been', 'good', 'much', 'some', 'time', 'very', 'when'],
-        'medium': ['people', 'about', 'would', 'could', 'there', 'their', 'think', 'where', 'being', 'right',
-                  'before', 'after', 'should', 'through', 'during', 'follow', 'around', 'between', 'without', 'something'],
-        'hard': ['government', 'development', 'management', 'information', 'environment', 'community', 'university', 'technology', 'opportunity', 'experience',
-                'achievement', 'responsibility', 'understanding', 'communication', 'organization', 'relationship', 'professional', 'international', 'contemporary', 'perspective']
-    }
-    
-    words = word_lists.get(difficulty, word_lists['medium'])
+    if difficulty not in WORD_LISTS[CURRENT_VERSION]:
+        difficulty = 'medium'
     target_words = max(20, duration * 2)  # At least 20 words, or 2 per second
-    
-    # Generate text
-    text_words = []
-    for _ in range(target_words):
-        text_words.append(random.choice(words))
-    
-    return ' '.join(text_words)
\ No newline at end of file
+    return make_prompt_ref(difficulty, target_words)
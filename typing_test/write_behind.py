@@ -0,0 +1,144 @@
+"""
+Write-behind buffer for completed test sessions.
+
+When ``TYPING_WRITE_BEHIND`` is enabled, ``complete_test_session`` answers as
+soon as the result is computed and hands the session to ``write_buffer``. A
+per-process flusher thread writes buffered sessions every
+``TYPING_WRITE_BEHIND_FLUSH_MS`` milliseconds, or sooner once
+``TYPING_WRITE_BEHIND_BATCH`` are waiting: new rows with one ``bulk_create``,
+started rows with one ``bulk_update``, then stats and leaderboards once per
+user and board. The buffer is drained when the worker exits. Sessions still
+buffered when a worker is killed outright are lost, which is the trade-off
+this opt-in mode makes for request latency.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+from .batch import update_boards
+from .completion import store_keystroke_logs
+from .models import TestSession, UserStats
+
+logger = logging.getLogger(__name__)
+
+# Fields written when a session started with a row is completed
+COMPLETION_FIELDS = [
+    'typed_text', 'wpm', 'accuracy', 'typing_time', 'composite_score', 'completed', 'completed_at',
+    'correct_chars', 'incorrect_chars', 'extra_chars', 'missed_chars', 'total_chars', 'focus_lost_count', 'suspicious_events',
+]
+
+
+class WriteBehindBuffer:
+    """Bounded queue of completed sessions with a background flusher thread"""
+
+    def __init__(self, max_items=1000, flush_interval=0.2, batch_size=100):
+        self.max_items = max_items
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._pid = None
+
+    def submit(self, session):
+        """Queue a completed session (already checked by verify_completion); returns False if the buffer is full"""
+        with self._lock:
+            if self._stopping or len(self._queue) >= self.max_items:
+                return False
+            self._queue.append(session)
+            size = len(self._queue)
+        self._ensure_thread()
+        if size >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def __len__(self):
+        return len(self._queue)
+
+    def flush(self):
+        """Write everything queued so far; returns the number of sessions written"""
+        written = 0
+        while True:
+            with self._lock:
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if not batch:
+                return written
+            unsaved = [session for session in batch if session.pk is None]
+            try:
+                write_sessions(batch)
+                written += len(batch)
+                continue
+            except Exception:
+                logger.exception('Write-behind flush of %d sessions failed, retrying singly', len(batch))
+
+            # The batch was rolled back; retry one by one so a bad row does not lose the rest
+            for session in unsaved:
+                session.pk = None
+            for session in batch:
+                try:
+                    write_sessions([session])
+                    written += 1
+                except Exception:
+                    logger.exception('Dropped buffered session for user %s', session.user_id)
+
+    def drain(self):
+        """Stop accepting sessions and write out the rest (run at worker exit)"""
+        with self._lock:
+            self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=10)
+        self.flush()
+        connections.close_all()
+
+    def _ensure_thread(self):
+        # Started lazily so each forked worker gets its own flusher
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='write-behind-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            self.flush()
+        connections.close_all()
+
+
+def write_sessions(sessions):
+    """Persist completed sessions and fold them into stats and leaderboards"""
+    new_sessions = [s for s in sessions if s.pk is None]
+    started_sessions = [s for s in sessions if s.pk is not None]
+
+    by_user = {}
+    with transaction.atomic():
+        TestSession.objects.bulk_create(new_sessions)
+        TestSession.objects.bulk_update(started_sessions, COMPLETION_FIELDS)
+        store_keystroke_logs(sessions)
+        for session in sessions:
+            if session.user_id:
+                by_user.setdefault(session.user_id, []).append(session)
+        for user_id, user_sessions in by_user.items():
+            UserStats.record_sessions(user_id, user_sessions)
+        update_boards([s for s in sessions if s.user_id])
+
+
+write_buffer = WriteBehindBuffer(
+    max_items=getattr(settings, 'TYPING_WRITE_BEHIND_MAX_ITEMS', 1000),
+    flush_interval=getattr(settings, 'TYPING_WRITE_BEHIND_FLUSH_MS', 200) / 1000,
+    batch_size=getattr(settings, 'TYPING_WRITE_BEHIND_BATCH', 100),
+)
+atexit.register(write_buffer.drain)